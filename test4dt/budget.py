@@ -0,0 +1,67 @@
+import contextvars
+
+# the cost of the generation running in the current task, None outside of one
+request_cost = contextvars.ContextVar('request_cost', default=None)
+
+
+class RequestCost:
+    def __init__(self):
+        self.requests = 0
+        self.tokens = 0
+
+    def add(self, tokens):
+        self.requests += 1
+        self.tokens += tokens
+
+
+def track_request(tokens):
+    cost = request_cost.get()
+    if cost is not None:
+        cost.add(tokens)
+
+
+class RoundBudget:
+    """LLM requests and tokens one round may spend, 0 means no limit.
+
+    A generation reserves its expected cost when it starts and pays its real cost when it ends,
+    so concurrent generations cannot overrun the budget by more than one estimate.
+    """
+
+    def __init__(self, max_requests=0, max_tokens=0):
+        self.max_requests = max_requests
+        self.max_tokens = max_tokens
+        self.spent = RequestCost()
+        self.reserved = RequestCost()
+        self.history = []
+
+    def is_limited(self):
+        return self.max_requests > 0 or self.max_tokens > 0
+
+    def get_estimate(self):
+        if not self.history:
+            return 3, 6000
+        return (sum(cost.requests for cost in self.history) / len(self.history),
+                sum(cost.tokens for cost in self.history) / len(self.history))
+
+    def can_start(self):
+        requests, tokens = self.get_estimate()
+        if self.max_requests > 0 and self.spent.requests + self.reserved.requests + requests > self.max_requests:
+            return False
+        if self.max_tokens > 0 and self.spent.tokens + self.reserved.tokens + tokens > self.max_tokens:
+            return False
+        return True
+
+    def reserve(self):
+        requests, tokens = self.get_estimate()
+        self.reserved.requests += requests
+        self.reserved.tokens += tokens
+        return requests, tokens
+
+    def pay(self, reservation, cost: RequestCost):
+        self.reserved.requests -= reservation[0]
+        self.reserved.tokens -= reservation[1]
+        self.spent.requests += cost.requests
+        self.spent.tokens += cost.tokens
+        # a generation that returned before asking anything would pull the estimate down
+        if cost.requests > 0:
+            self.history.append(cost)
@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+
+class ResponseCache:
+    def __init__(self, path, max_size, commit_interval=32):
+        self.path = path
+        self.max_size = max_size
+        self.size = 0
+        self.connection = None
+        # a commit syncs the file, it is done once for this many responses and at the end of a phase
+        self.commit_interval = commit_interval
+        self.uncommitted = 0
+
+    @staticmethod
+    def get_key(model_type, temperature, messages):
+        payload = json.dumps([model_type, temperature, messages], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def connect(self):
+        if self.connection is not None:
+            return self.connection
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS responses '
+                                '(key TEXT PRIMARY KEY, response TEXT NOT NULL, '
+                                'size INTEGER NOT NULL, accessed REAL NOT NULL)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)')
+        self.size = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        return self.connection
+
+    def get(self, key):
+        connection = self.connect()
+        row = connection.execute('SELECT response FROM responses WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        # access time is committed together with the next insert
+        connection.execute('UPDATE responses SET accessed = ? WHERE key = ?', (time.time(), key))
+        return row[0]
+
+    def put(self, key, response):
+        size = len(response.encode('utf-8'))
+        if size > self.max_size:
+            return
+        connection = self.connect()
+        row = connection.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+        if row is not None:
+            self.size -= row[0]
+        connection.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)',
+                           (key, response, size, time.time()))
+        self.size += size
+        self.evict()
+        self.uncommitted += 1
+        if self.uncommitted >= self.commit_interval:
+            self.commit()
+
+    def commit(self):
+        if self.connection is not None:
+            self.connection.commit()
+        self.uncommitted = 0
+
+    def evict(self):
+        # drop least recently used responses until the cache fits in max_size
+        while self.size > self.max_size:
+            rows = self.connection.execute('SELECT key, size FROM responses ORDER BY accessed LIMIT 64').fetchall()
+            if not rows:
+                self.size = 0
+                return
+            for key, size in rows:
+                self.connection.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self.size -= size
+                if self.size <= self.max_size:
+                    break
+
+    def close(self):
+        if self.connection is not None:
+            self.commit()
+            self.connection.close()
+            self.connection = None
@@ -0,0 +1,49 @@
+import json
+import os
+import threading
+
+
+class Cassette:
+    def __init__(self, path):
+        self.path = path
+        self.responses = {}
+        self.positions = {}
+        self.lock = threading.Lock()
+
+    def load(self):
+        self.responses = {}
+        self.positions = {}
+        if not os.path.exists(self.path):
+            return self
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip() == '':
+                    continue
+                exchange = json.loads(line)
+                self.responses.setdefault(exchange['key'], []).append(exchange['response'])
+        return self
+
+    def record(self, key, model_type, temperature, messages, response):
+        exchange = {
+            'key': key,
+            'model': model_type,
+            'temperature': temperature,
+            'messages': messages,
+            'response': response
+        }
+        directory = os.path.dirname(self.path)
+        with self.lock:
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(exchange, ensure_ascii=False) + '\n')
+
+    def replay(self, key):
+        # identical prompts are answered in recorded order, the last answer is repeated once they run out
+        with self.lock:
+            responses = self.responses.get(key)
+            if not responses:
+                return None
+            position = self.positions.get(key, 0)
+            self.positions[key] = position + 1
+            return responses[min(position, len(responses) - 1)]
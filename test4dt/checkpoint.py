@@ -0,0 +1,131 @@
+import asyncio
+import copy
+import json
+import os
+import threading
+import time
+
+from test4dt.coverage_message import CoverageMessage
+from test4dt.recorder import recoder
+
+
+class Checkpoint:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.saves = 0
+        self.written = 0
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def get_state(self, project):
+        # a snapshot, it is written while the generation goes on
+        return {
+            'round': project.round,
+            'completed': sorted(project.completed),
+            'coverage_summary': project.coverage_summary,
+            'readme_analyses': dict(project.readme_analyses),
+            'functions': {function.unique_name: self.dump_function(function) for function in project.get_functions()},
+            'classes': {class_message.full_name: self.dump_class(class_message)
+                        for class_message in project.get_classes()},
+            'recoder': copy.deepcopy({
+                'elapsed': time.time() - recoder.start_time,
+                'times': recoder.get_times(),
+                'stats': recoder.stats,
+                'score': recoder.score.__dict__
+            })
+        }
+
+    def write(self, state, number):
+        with self.lock:
+            # a slow earlier save must not replace a later one
+            if number < self.written:
+                return
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # write next to the checkpoint and rename, so a kill never leaves a truncated file
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.path)
+            self.written = number
+
+    def save(self, project):
+        self.saves += 1
+        self.write(self.get_state(project), self.saves)
+
+    async def asave(self, project):
+        # serializing the whole project takes a while, it must not hold up the event loop
+        self.saves += 1
+        await asyncio.to_thread(self.write, self.get_state(project), self.saves)
+
+    @staticmethod
+    def dump_function(function):
+        # summary vectors are cheap to recompute and would dominate the checkpoint size
+        analysis = function.to_knowledge()
+        analysis['vector'] = None
+        test_manager = function.test_manager
+        coverage = None
+        if test_manager.coverage is not None:
+            coverage = {'missing_lines': test_manager.coverage.missing_lines, 'summary': test_manager.coverage.summary}
+        return {
+            'analysis': analysis,
+            'testcases': [testcase.test_path for testcase in test_manager.testcases],
+            'count': test_manager.count,
+            'coverage': coverage
+        }
+
+    @staticmethod
+    def dump_class(class_message):
+        analysis = class_message.to_knowledge()
+        analysis['vector'] = None
+        return analysis
+
+    @staticmethod
+    def remove_unlisted_tests(project, test_paths):
+        # tests written after the checkpoint may be partial or hang, coverage runs them without a timeout
+        test_dir = os.path.join(project.root_dir, project.dir_type)
+        if not os.path.isdir(test_dir):
+            return
+        test_paths = {os.path.normpath(test_path) for test_path in test_paths}
+        for file in os.listdir(test_dir):
+            file_path = os.path.normpath(os.path.join(test_dir, file))
+            if file.startswith('test_') and file.endswith('.py') and file_path not in test_paths:
+                os.remove(file_path)
+
+    @staticmethod
+    def restore_readmes(project, state):
+        # README analyses are needed before the rest, they are part of the knowledge keys
+        project.readme_analyses.update(state['readme_analyses'])
+
+    def restore(self, project, state):
+        project.round = state['round']
+        project.completed = set(state['completed'])
+        project.coverage_summary = state['coverage_summary']
+        functions = state['functions']
+        test_paths = set()
+        for function in project.get_functions():
+            if function.unique_name not in functions:
+                continue
+            saved = functions[function.unique_name]
+            test_paths.update(saved['testcases'])
+            function.load_knowledge(saved['analysis'])
+            test_manager = function.test_manager
+            test_manager.count = saved['count']
+            test_manager.restore_testcases(saved['testcases'])
+            if saved['coverage'] is not None:
+                test_manager.coverage = CoverageMessage(saved['coverage']['missing_lines'], saved['coverage']['summary'])
+        self.remove_unlisted_tests(project, test_paths)
+        classes = state['classes']
+        for class_message in project.get_classes():
+            if class_message.full_name in classes:
+                class_message.load_knowledge(classes[class_message.full_name])
+
+        saved_recoder = state['recoder']
+        recoder.start_time = time.time() - saved_recoder['elapsed']
+        recoder.times.update(saved_recoder['times'])
+        recoder.stats.update(saved_recoder['stats'])
+        recoder.score.__dict__.update(saved_recoder['score'])
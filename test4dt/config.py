@@ -1,5 +1,36 @@
+import os
+
+
 class Config:
     need_extract_type: bool = False
     run_benchmark: bool = False
+    use_cache: bool = True
+    cache_path: str = '.test4dt_cache/responses.sqlite'
+    cache_max_size: int = 512 * 1024 * 1024
+    llm_concurrency: int = 200
+    llm_pool_size: int = 200
+    llm_keepalive: float = 30.0
+    llm_http2: bool = True
+    llm_max_retries: int = 6
+    llm_base_backoff: float = 1.0
+    llm_max_backoff: float = 60.0
+    llm_mode: str = 'live'
+    llm_base_url: str = None
+    cassette_path: str = '.test4dt_cache/cassette.jsonl'
+    analyze_width: int = 64
+    use_knowledge: bool = True
+    checkpoint_interval: int = 20
+    embed_batch_size: int = 32
+    pytest_workers: int = min(os.cpu_count() or 1, 8)
+    pytest_worker_startup_timeout: float = 120.0
+    check_concurrency: int = os.cpu_count() or 1
+    fast_check: bool = True
+    decline_mode: str = 'prune'
+    test_timeout: float = 2.0
+    coverage_workers: int = os.cpu_count() or 1
+    coverage_contexts: bool = False
+    prune_redundant_tests: bool = False
+    round_request_budget: int = 0
+    round_token_budget: int = 0
 
 config = Config()
\ No newline at end of file
@@ -1,29 +1,272 @@
+import glob
+import hashlib
+import heapq
 import json
 import os.path
+import re
+import shutil
 import subprocess
+from collections import Counter
+
+import coverage
 from dotenv import load_dotenv
 
+from test4dt.config import config
+from test4dt.recorder import recoder
+from test4dt.utils import to_mod_name
+
 
 class MyCoverage:
+    """Coverage of the generated tests, only new and changed test files run each round.
+
+    Every run writes its own data file, sharded over parallel processes balanced by the durations of
+    earlier runs. The manifest records which data file holds the coverage of which test file at which
+    hash, and the report is combined from all data files still valid.
+    """
+
     def __init__(self, path, test_path, source_dir):
         self.path = path
         self.test_path = test_path
         self.source_dir = source_dir
+        self.data_dir = os.path.join(path, test_path, '.test4dt', 'coverage')
+        self.manifest_path = os.path.join(self.data_dir, 'manifest.json')
+        self.combined_file = os.path.join(self.data_dir, 'combined.coverage')
+        self.rc_path = os.path.join(self.data_dir, 'coveragerc')
+        self.attribution_path = os.path.join(self.data_dir, 'attribution.json')
+        self.covered = None
         load_dotenv()
 
+    @staticmethod
+    def use_contexts():
+        return config.coverage_contexts or config.prune_redundant_tests
+
+    @staticmethod
+    def get_file_hash(file_path):
+        with open(file_path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def get_source_hash(self):
+        # coverage recorded against other sources is worthless
+        sha = hashlib.sha256()
+        source_dir = os.path.join(self.path, self.source_dir)
+        for root, dirs, files in os.walk(source_dir):
+            dirs[:] = sorted(directory for directory in dirs if not directory.startswith('.'))
+            for file in sorted(files):
+                if file.endswith('.py'):
+                    file_path = os.path.join(root, file)
+                    sha.update(os.path.relpath(file_path, source_dir).encode('utf-8'))
+                    sha.update(self.get_file_hash(file_path).encode('utf-8'))
+        return sha.hexdigest()
+
+    def get_test_files(self):
+        test_files = {}
+        test_dir = os.path.join(self.path, self.test_path)
+        for root, dirs, files in os.walk(test_dir):
+            dirs[:] = [directory for directory in dirs if not directory.startswith('.')]
+            for file in files:
+                if file.endswith('.py') and (file.startswith('test_') or file.endswith('_test.py')):
+                    file_path = os.path.join(root, file)
+                    test_files[os.path.relpath(file_path, self.path)] = self.get_file_hash(file_path)
+        return test_files
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'source_hash': None, 'files': {}}
+
+    def save_manifest(self, manifest):
+        os.makedirs(self.data_dir, exist_ok=True)
+        with open(self.manifest_path, 'w') as f:
+            json.dump(manifest, f)
+
+    def start_coverage(self, args):
+        # output is not read, pipes could fill up and block the shards running side by side
+        return subprocess.Popen([os.getenv('USER_PYTHON_PATH'), '-m', 'coverage'] + args, cwd=self.path,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def run_coverage(self, args):
+        self.start_coverage(args).communicate()
+
+    @staticmethod
+    def split_shards(test_files, durations, count):
+        # longest processing time first: the slowest file goes to the shard with the least work so far
+        known = [durations[test_file] for test_file in test_files if test_file in durations]
+        default = sum(known) / len(known) if known else 1.0
+        ordered = sorted(test_files, key=lambda test_file: (-durations.get(test_file, default), test_file))
+        shards = [(0.0, index, []) for index in range(min(count, len(ordered)))]
+        for test_file in ordered:
+            total, index, files = heapq.heappop(shards)
+            files.append(test_file)
+            heapq.heappush(shards, (total + durations.get(test_file, default), index, files))
+        return [sorted(files) for _, _, files in sorted(shards, key=lambda shard: shard[1])]
+
+    def read_durations(self, report_path):
+        durations = {}
+        try:
+            with open(report_path, 'r') as f:
+                report = json.load(f)
+        except (OSError, ValueError):
+            return durations
+        finally:
+            if os.path.exists(report_path):
+                os.remove(report_path)
+        for test in report.get('tests', []):
+            test_file = test['nodeid'].split('::')[0]
+            for phase in ('setup', 'call', 'teardown'):
+                durations[test_file] = durations.get(test_file, 0.0) + test.get(phase, {}).get('duration', 0.0)
+        return durations
+
+    def get_run_options(self):
+        options = ['--branch', f'--source={self.source_dir}']
+        if self.use_contexts():
+            # dynamic_context can only be set in a configuration file
+            with open(self.rc_path, 'w') as f:
+                f.write('[run]\ndynamic_context = test_function\n')
+            options.append(f'--rcfile={self.rc_path}')
+        return options
+
+    def run_tests(self, test_files, durations):
+        sha = hashlib.sha256(json.dumps(sorted(test_files.items())).encode('utf-8'))
+        data_file = os.path.join(self.data_dir, f'batch-{sha.hexdigest()[:16]}.coverage')
+        shards = self.split_shards(list(test_files), durations, config.coverage_workers)
+        parallel = ['--parallel-mode'] if len(shards) > 1 else []
+        processes = []
+        for index, shard in enumerate(shards):
+            # nodeids relative to the project root are the keys of the manifest
+            report_path = os.path.join(self.data_dir, f'shard-{index}.json')
+            args = ['run', f'--data-file={data_file}'] + self.get_run_options() + parallel + \
+                   ['-m', 'pytest', '--continue-on-collection-errors', f'--rootdir={self.path}',
+                    '--json-report', f'--json-report-file={report_path}'] + shard
+            processes.append((self.start_coverage(args), report_path))
+        for process, report_path in processes:
+            process.communicate()
+            durations.update(self.read_durations(report_path))
+        if parallel:
+            shard_files = glob.glob(glob.escape(data_file) + '.*')
+            self.run_coverage(['combine', f'--data-file={data_file}'] + shard_files)
+        recoder.set_stat('coverage_shards', len(shards))
+        return os.path.basename(data_file)
+
     def get_coverage(self):
-        cwd_path = self.path
-        args = [os.getenv('USER_PYTHON_PATH'), '-m', 'coverage', 'run', '-m', '--branch', f'--source={self.source_dir}', 'pytest', '--continue-on-collection-errors', self.test_path]
-        process = subprocess.Popen(args, cwd=cwd_path, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        process.communicate()
+        manifest = self.load_manifest()
+        source_hash = self.get_source_hash()
+        if manifest['source_hash'] != source_hash or manifest.get('contexts', False) != self.use_contexts():
+            manifest = {'source_hash': source_hash, 'contexts': self.use_contexts(), 'files': {},
+                        'durations': manifest.get('durations', {})}
+        test_files = self.get_test_files()
+        entries = manifest['files']
+
+        # a data file also holds the lines of tests that changed since, so all of its tests run again
+        stale = {entry['data'] for test_file, entry in entries.items() if test_files.get(test_file) != entry['hash']}
+        # the tests of a data file that went missing have no coverage anymore, they run again as well
+        stale |= {entry['data'] for entry in entries.values()
+                  if not os.path.exists(os.path.join(self.data_dir, entry['data']))}
+        entries = {test_file: entry for test_file, entry in entries.items() if entry['data'] not in stale}
+        for data_file in stale:
+            try:
+                os.remove(os.path.join(self.data_dir, data_file))
+            except FileNotFoundError:
+                pass
+        to_run = {test_file: file_hash for test_file, file_hash in test_files.items() if test_file not in entries}
+        os.makedirs(self.data_dir, exist_ok=True)
+        durations = {test_file: duration for test_file, duration in manifest.get('durations', {}).items()
+                     if test_file in test_files}
+        if to_run:
+            data_file = self.run_tests(to_run, durations)
+            for test_file, file_hash in to_run.items():
+                entries[test_file] = {'hash': file_hash, 'data': data_file}
+        manifest['files'] = entries
+        manifest['durations'] = durations
+        self.save_manifest(manifest)
+        recoder.set_stat('coverage_run_test_files', len(to_run))
+        recoder.set_stat('coverage_reused_test_files', len(test_files) - len(to_run))
+
+        data_files = sorted({os.path.join(self.data_dir, entry['data']) for entry in entries.values()})
+        data_files = [data_file for data_file in data_files if os.path.exists(data_file)]
+        combined_file = self.combined_file
+        if len(data_files) == 1:
+            # combining a run that executed nothing would lose its branch mode
+            shutil.copyfile(data_files[0], combined_file)
+        elif data_files:
+            self.run_coverage(['combine', '--keep', f'--data-file={combined_file}'] + data_files)
+        else:
+            # without any test the report still has to list every source file as missed
+            self.run_coverage(['run', f'--data-file={combined_file}'] + self.get_run_options() +
+                              ['-m', 'pytest', '--continue-on-collection-errors', self.test_path])
+
+        self.run_coverage(['json', '-i', f'--data-file={combined_file}', '-o', f'{self.test_path}/coverage.json'])
 
-        args = [os.getenv('USER_PYTHON_PATH'), '-m', 'coverage', 'json', '-i', '-o', f'{self.test_path}/coverage.json']
-        process = subprocess.Popen(args, cwd=cwd_path, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        process.communicate()
+        if self.use_contexts() and data_files:
+            self.save_attribution(self.get_test_coverage(list(test_files)))
 
         with open(os.path.join(self.path, f'{self.test_path}/coverage.json'), 'r') as f:
             return json.load(f)
 
+    @staticmethod
+    def find_test_file(context, test_modules):
+        # contexts are qualified test names, e.g. Test4DT_tests.test_x.TestClass.test_y
+        parts = context.split('.')
+        for end in range(len(parts) - 1, 0, -1):
+            test_file = test_modules.get('.'.join(parts[:end]))
+            if test_file is not None:
+                return test_file
+        return None
+
+    def get_test_coverage(self, test_files):
+        """Lines and arcs covered by each test file, read from the dynamic contexts of the combined data."""
+        data = coverage.CoverageData(basename=self.combined_file)
+        data.read()
+        test_modules = {}
+        for test_file in test_files:
+            module = to_mod_name(test_file)
+            # pytest may import a test module under its package or under its bare name
+            test_modules[module] = test_file
+            test_modules.setdefault(module.split('.')[-1], test_file)
+        contexts = {}
+        for context in data.measured_contexts():
+            test_file = self.find_test_file(context, test_modules)
+            if test_file is not None:
+                contexts.setdefault(test_file, []).append(context)
+
+        # a test file without any context is not known to cover nothing, it is left out
+        covered = {test_file: set() for test_file in contexts}
+        for test_file, file_contexts in contexts.items():
+            data.set_query_contexts(['^(' + '|'.join(re.escape(context) for context in file_contexts) + ')$'])
+            for source_file in data.measured_files():
+                covered[test_file].update((source_file, line) for line in data.lines(source_file) or [])
+                covered[test_file].update((source_file, arc) for arc in data.arcs(source_file) or [])
+        data.set_query_contexts(None)
+        return covered
+
+    @staticmethod
+    def get_marginal_coverage(covered):
+        counts = Counter(item for items in covered.values() for item in items)
+        return {test_file: sum(1 for item in items if counts[item] == 1) for test_file, items in covered.items()}
+
+    def save_attribution(self, covered):
+        marginal = self.get_marginal_coverage(covered)
+        attribution = {test_file: {'covered': len(items), 'marginal': marginal[test_file]}
+                       for test_file, items in sorted(covered.items())}
+        with open(self.attribution_path, 'w') as f:
+            json.dump(attribution, f, indent=2)
+        self.covered = covered
+        recoder.set_stat('zero_delta_tests', sum(1 for value in marginal.values() if value == 0))
+
+    def find_redundant_tests(self):
+        """Test files whose lines and arcs the remaining tests cover as well, smallest first."""
+        if self.covered is None:
+            return []
+        counts = Counter(item for items in self.covered.values() for item in items)
+        redundant = []
+        for test_file in sorted(self.covered, key=lambda test_file: (len(self.covered[test_file]), test_file)):
+            items = self.covered[test_file]
+            if all(counts[item] > 1 for item in items):
+                counts.subtract(items)
+                redundant.append(test_file)
+        return redundant
+
 
 class CoverageMessage:
     def __init__(self, missing_lines, summary):
@@ -1,11 +1,15 @@
 import os
-import re
+import time
 from dotenv import load_dotenv
+from tqdm import tqdm
 from langchain_core.embeddings import Embeddings
 from transformers import AutoTokenizer, AutoModel
 import torch
 from typing import List
 import chromadb
+import numpy as np
+from test4dt.config import config
+from test4dt.recorder import recoder
 
 
 class HuggingFaceEmbedder(Embeddings):
@@ -25,10 +29,16 @@ class HuggingFaceEmbedder(Embeddings):
         with torch.no_grad():
             outputs = self.model(**inputs)
 
-        embedding = torch.mean(outputs.last_hidden_state, dim=1).squeeze()
+        embedding = self.mean_pooling(outputs.last_hidden_state, inputs['attention_mask']).squeeze()
 
         return embedding.tolist()
 
+    @staticmethod
+    def mean_pooling(last_hidden_state, attention_mask):
+        # average over real tokens only, padding must not dilute the vectors of short texts in a batch
+        mask = attention_mask.unsqueeze(-1).to(last_hidden_state.dtype)
+        return (last_hidden_state * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+
     def __init__(self, model_name_or_path: str, embed_instruction: str = "", show_progress: bool = False,
                  encode_kwargs=None):
         if encode_kwargs is None:
@@ -41,44 +51,75 @@ class HuggingFaceEmbedder(Embeddings):
         self.model = AutoModel.from_pretrained(model_name_or_path, local_files_only=True).to(self.device)
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        texts = [self.embed_instruction + t.replace("\n", " ") for t in texts]
+        """Embed texts in batches of similar token length.
 
-        inputs = self.tokenizer(texts, padding=True, truncation=True, return_tensors="pt", max_length=512, **self.encode_kwargs)
-        inputs = {key: value.to(self.device) for key, value in inputs.items()}
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-
-        embeddings = torch.mean(outputs.last_hidden_state, dim=1)
-
-        return embeddings.tolist()
-
-
-def find_topK_message(name, messages, query_vector, k=1):
-    ids = []
-    vectors = []
-    name = re.sub(r"[^a-zA-Z]", "", name)[-30:]
-    collection = client.create_collection(name)
-    for index, value in enumerate(messages):
-        ids.append(str(index))
-        vectors.append(value.vector)
-    collection.add(
-        embeddings=vectors,
-        ids=ids
-    )
-    try:
-        results = collection.query(
-            query_embeddings=[query_vector],
-            n_results=k
-        )
-    except RuntimeError:
-        client.delete_collection(name)
-        return messages
-    client.delete_collection(name)
+        Args:
+            texts: Texts to embed.
 
-    top_k = []
-    for index in results['ids'][0]:
-        top_k.append(messages[int(index)])
-    return top_k
+        Returns:
+            Embeddings in the order of the texts.
+        """
+        if len(texts) == 0:
+            return []
+        start_time = time.time()
+        texts = [self.embed_instruction + t.replace("\n", " ") for t in texts]
+        lengths = [len(ids) for ids in self.tokenizer(texts, truncation=True, max_length=512)['input_ids']]
+        order = sorted(range(len(texts)), key=lambda index: lengths[index])
+        batch_size = config.embed_batch_size
+        embeddings: List[List[float]] = [[] for _ in texts]
+
+        batches = range(0, len(order), batch_size)
+        if self.show_progress:
+            batches = tqdm(batches, desc="Embedding")
+        for start in batches:
+            batch = order[start: start + batch_size]
+            inputs = self.tokenizer([texts[index] for index in batch], padding=True, truncation=True,
+                                    return_tensors="pt", max_length=512, **self.encode_kwargs)
+            inputs = {key: value.to(self.device) for key, value in inputs.items()}
+            with torch.no_grad():
+                outputs = self.model(**inputs)
+            pooled = self.mean_pooling(outputs.last_hidden_state, inputs['attention_mask'])
+            for index, embedding in zip(batch, pooled.tolist()):
+                embeddings[index] = embedding
+
+        recoder.add_stat('embedding_texts', len(texts))
+        recoder.add_stat('embedding_time', time.time() - start_time)
+        recoder.set_stat('embedding_texts_per_sec', recoder.stats['embedding_texts'] / max(recoder.stats['embedding_time'], 1e-9))
+        return embeddings
+
+
+class VectorIndex:
+    """Exact top-k search over the vectors of a fixed list of messages.
+
+    Distances are squared L2 like the chroma default, so the order matches the old per-query collections.
+    """
+
+    def __init__(self, messages):
+        self.messages = [message for message in messages if message.vector is not None]
+        self.rows = {message: row for row, message in enumerate(self.messages)}
+        if self.messages:
+            self.matrix = np.asarray([message.vector for message in self.messages], dtype=np.float32)
+        else:
+            self.matrix = np.empty((0, 0), dtype=np.float32)
+        self.norms = np.einsum('ij,ij->i', self.matrix, self.matrix)
+
+    def query(self, query_vector, k=1, candidates=None):
+        """Return the k messages nearest to query_vector, only among candidates when given."""
+        if candidates is None:
+            rows = np.arange(len(self.messages))
+        else:
+            rows = np.fromiter((self.rows[message] for message in candidates if message in self.rows), dtype=np.int64)
+        if len(rows) == 0:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        # |x - q|^2 = |x|^2 - 2 x.q + |q|^2, the last term does not change the order
+        distances = self.norms[rows] - 2 * (self.matrix[rows] @ query)
+        if k < len(rows):
+            nearest = np.argpartition(distances, k)[:k]
+            nearest = nearest[np.argsort(distances[nearest], kind='stable')]
+        else:
+            nearest = np.argsort(distances, kind='stable')
+        return [self.messages[rows[index]] for index in nearest]
 
 
 class FunctionDatabase:
@@ -88,14 +129,18 @@ class FunctionDatabase:
 
     def init(self, project):
         ids = []
-        vectors = []
         for file_message in project.file_messages:
             for function in file_message.functions:
                 if function.summary is None:
                     continue
                 ids.append(str(len(self.functions)))
                 self.functions.append(function)
-                vectors.append(embedder.embed_query(function.summary))
+        missing = [function for function in self.functions if function.vector is None]
+        for function, vector in zip(missing, embedder.embed_documents([function.summary for function in missing])):
+            function.vector = vector
+        vectors = [function.vector for function in self.functions]
+        if len(ids) == 0:
+            return
         self.collection.add(
             embeddings=vectors,
             ids=ids
@@ -118,6 +163,6 @@ class FunctionDatabase:
 
 
 load_dotenv()
-embedder = HuggingFaceEmbedder(model_name_or_path=os.getenv('TRANSFORMER_PATH') or '')
+embedder = HuggingFaceEmbedder(model_name_or_path=os.getenv('TRANSFORMER_PATH') or '', show_progress=True)
 client = chromadb.Client()
 function_database = FunctionDatabase()
@@ -1,9 +1,86 @@
 import os
-from openai import OpenAI
+import random
+import re
+import httpx
+import openai
+from openai import AsyncOpenAI
 from dotenv import load_dotenv
 from aiolimiter import AsyncLimiter
 import asyncio
 import logging
+from test4dt.budget import track_request
+from test4dt.cache import ResponseCache
+from test4dt.cassette import Cassette
+from test4dt.config import config
+from test4dt.recorder import recoder
+
+
+class LLMError(Exception):
+    pass
+
+
+class LLMRateLimitError(LLMError):
+    pass
+
+
+class LLMTransportError(LLMError):
+    pass
+
+
+class LLMResponseError(LLMError):
+    pass
+
+
+def parse_duration(value):
+    # x-ratelimit-reset-* headers look like "20ms", "1s" or "6m0s"
+    if not value:
+        return None
+    units = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+    parts = re.findall(r'(\d+(?:\.\d+)?)(ms|h|m|s)', value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(number) * units[unit] for number, unit in parts)
+
+
+class AdaptiveLimiter(AsyncLimiter):
+    def __init__(self, max_rate, time_period=60, min_rate=1):
+        super().__init__(max_rate=max_rate, time_period=time_period)
+        self.base_rate = max_rate
+        self.min_rate = min_rate
+
+    def set_rate(self, max_rate):
+        max_rate = max(self.min_rate, min(self.base_rate, max_rate))
+        if max_rate == self.max_rate:
+            return
+        self.max_rate = max_rate
+        self._rate_per_sec = max_rate / self.time_period
+        recoder.set_stat('llm_rate', max_rate)
+
+    def throttle(self):
+        self.set_rate(self.max_rate / 2)
+
+    def recover(self):
+        self.set_rate(self.max_rate + self.base_rate * 0.05)
+
+    def adapt(self, headers):
+        remaining = headers.get('x-ratelimit-remaining-requests')
+        reset = parse_duration(headers.get('x-ratelimit-reset-requests'))
+        try:
+            remaining = int(remaining)
+        except (TypeError, ValueError):
+            remaining = None
+        if remaining is None or not reset:
+            self.recover()
+            return
+        # spread what is left of the server-side budget until it resets
+        allowed = remaining / reset * self.time_period
+        if allowed < self.max_rate:
+            self.set_rate(allowed)
+        else:
+            self.recover()
 
 
 class MyGPT:
@@ -16,13 +93,22 @@ class MyGPT:
         if os.getenv('MODEL'):
             model_type = os.getenv('MODEL')
         self.temperature = temperature
-        self.limiter = AsyncLimiter(max_rate=max_rate, time_period=time_period)
+        self.limiter = AdaptiveLimiter(max_rate=max_rate, time_period=time_period)
         self.model_type = model_type
 
-        self.client = OpenAI(
-            api_key=self.openai_api_key,
-            base_url=self.openai_api_base,
-        )
+        # the async client and its semaphore are bound to the event loop they were created in,
+        # and test4dt.start runs one event loop per phase, so they are created lazily per loop
+        self.loop = None
+        self.client = None
+        self.semaphore = None
+        self.cache = None
+        if config.use_cache and config.llm_mode in ('live', 'record'):
+            self.cache = ResponseCache(config.cache_path, config.cache_max_size)
+        self.cassette = None
+        if config.llm_mode == 'record':
+            self.cassette = Cassette(config.cassette_path)
+        elif config.llm_mode == 'replay':
+            self.cassette = Cassette(config.cassette_path).load()
 
         logging.basicConfig(
             filename='error.log',
@@ -31,24 +117,121 @@ class MyGPT:
             filemode='w'
         )
 
-    async def aask(self, system, user):
-        async with self.limiter:
-            messages = [{"role": "system", "content": system}, {"role": "user", "content": user}]
-            return await asyncio.to_thread(self.chat, messages)
-
-    def chat(self, messages)->str:
+    async def aask(self, system, user, default=None, cache=False):
+        # raises LLMError once retries are exhausted, unless a default answer is given.
+        # Only analyses of the project's code pass cache=True, a generated test or repair that failed
+        # once must get a new answer when it is asked for again
+        messages = [{"role": "system", "content": system}, {"role": "user", "content": user}]
+        key = ResponseCache.get_key(self.model_type, self.temperature, messages)
         try:
-            chat = self.client.chat.completions.create(
-                model=self.model_type,
-                messages=messages,
-                temperature=self.temperature,
-                stream=False
-            )
-            output = chat.choices[0].message.content
-            self.count += 1
-        except BaseException as e:
+            output = await self.answer(key, messages, cache)
+        except LLMError as e:
+            recoder.add_stat('llm_error')
+            if default is None:
+                raise
             logging.error(e)
-            return ""
+            return default
+        if config.llm_mode == 'record':
+            self.cassette.record(key, self.model_type, self.temperature, messages, output)
+        return output
+
+    async def answer(self, key, messages, cache=False) -> str:
+        if config.llm_mode == 'replay':
+            output = self.cassette.replay(key)
+            if output is None:
+                raise LLMResponseError(f"no recorded response for prompt {key}")
+            return output
+        cache = self.cache if cache else None
+        if cache is not None:
+            output = cache.get(key)
+            if output is not None:
+                recoder.add_stat('cache_hit')
+                return output
+            recoder.add_stat('cache_miss')
+        output = await self.request(messages)
+        if cache is not None:
+            cache.put(key, output)
+        return output
+
+    def get_client(self) -> AsyncOpenAI:
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            self.semaphore = asyncio.Semaphore(config.llm_concurrency)
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=config.llm_pool_size,
+                    max_keepalive_connections=config.llm_pool_size,
+                    keepalive_expiry=config.llm_keepalive
+                ),
+                http2=config.llm_http2
+            )
+            self.client = AsyncOpenAI(
+                api_key=self.openai_api_key or 'test4dt',
+                base_url=config.llm_base_url or self.openai_api_base,
+                http_client=http_client,
+                max_retries=0
+            )
+        return self.client
+
+    async def aclose(self):
+        # called at the end of every phase, the pooled connections of its loop would leak otherwise,
+        # and the cached responses of the phase are committed
+        if self.client is not None and self.loop is asyncio.get_running_loop():
+            await self.client.close()
+        if self.cache is not None:
+            self.cache.commit()
+        self.loop = None
+        self.client = None
+        self.semaphore = None
+
+    def get_semaphore(self) -> asyncio.Semaphore:
+        self.get_client()
+        return self.semaphore
+
+    async def request(self, messages) -> str:
+        attempt = 0
+        while True:
+            try:
+                async with self.limiter:
+                    async with self.get_semaphore():
+                        return await self.chat(messages)
+            except (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError) as e:
+                retry_after = None
+                if isinstance(e, openai.APIStatusError):
+                    retry_after = parse_duration(e.response.headers.get('retry-after'))
+                if isinstance(e, openai.RateLimitError):
+                    recoder.add_stat('llm_rate_limited')
+                    self.limiter.throttle()
+                attempt += 1
+                if attempt > config.llm_max_retries:
+                    if isinstance(e, openai.RateLimitError):
+                        raise LLMRateLimitError(str(e)) from e
+                    raise LLMTransportError(str(e)) from e
+                delay = random.uniform(0, min(config.llm_max_backoff, config.llm_base_backoff * 2 ** attempt))
+                if retry_after is not None:
+                    delay = max(delay, retry_after)
+                recoder.add_stat('llm_retry')
+                await asyncio.sleep(delay)
+            except openai.OpenAIError as e:
+                raise LLMResponseError(str(e)) from e
+
+    async def chat(self, messages) -> str:
+        response = await self.get_client().chat.completions.with_raw_response.create(
+            model=self.model_type,
+            messages=messages,
+            temperature=self.temperature,
+            stream=False
+        )
+        self.limiter.adapt(response.headers)
+        chat = response.parse()
+        output = chat.choices[0].message.content
+        if output is None:
+            raise LLMResponseError(f"empty completion, finish reason: {chat.choices[0].finish_reason}")
+        self.count += 1
+        tokens = chat.usage.total_tokens if chat.usage is not None else 0
+        recoder.add_stat('llm_tokens', tokens)
+        track_request(tokens)
         return output
 
 model = MyGPT()
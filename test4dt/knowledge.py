@@ -0,0 +1,74 @@
+import hashlib
+import json
+import os
+import sqlite3
+
+from test4dt.recorder import recoder
+
+
+def get_hash(*parts) -> str:
+    sha = hashlib.sha256()
+    for part in parts:
+        sha.update(str(part).encode('utf-8'))
+        sha.update(b'\0')
+    return sha.hexdigest()
+
+
+class KnowledgeStore:
+    """LLM analyses and embeddings of a project, keyed by the code they were computed from."""
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = None
+
+    def connect(self):
+        if self.connection is not None:
+            return self.connection
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS knowledge '
+                                '(kind TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, PRIMARY KEY (kind, key))')
+        return self.connection
+
+    def get(self, kind, key):
+        row = self.connect().execute('SELECT value FROM knowledge WHERE kind = ? AND key = ?', (kind, key)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def put(self, kind, key, value):
+        connection = self.connect()
+        connection.execute('INSERT OR REPLACE INTO knowledge VALUES (?, ?, ?)', (kind, key, json.dumps(value)))
+        connection.commit()
+
+    def load(self, project):
+        reused_functions = 0
+        reused_classes = 0
+        for function in project.get_functions():
+            value = self.get('function', function.get_knowledge_key())
+            if value is not None:
+                function.load_knowledge(value)
+                reused_functions += 1
+        for class_message in project.get_classes():
+            value = self.get('class', class_message.get_knowledge_key())
+            if value is not None:
+                class_message.load_knowledge(value)
+                reused_classes += 1
+        recoder.set_stat('knowledge_reused_functions', reused_functions)
+        recoder.set_stat('knowledge_reused_classes', reused_classes)
+
+    def save(self, project):
+        # the store mirrors the current project, entries of code that no longer exists are dropped
+        entities = [('function', function.get_knowledge_key(), function.to_knowledge())
+                    for function in project.get_functions()]
+        entities += [('class', class_message.get_knowledge_key(), class_message.to_knowledge())
+                     for class_message in project.get_classes()]
+        connection = self.connect()
+        with connection:
+            connection.execute("CREATE TEMP TABLE IF NOT EXISTS current (kind TEXT NOT NULL, key TEXT NOT NULL)")
+            connection.execute("DELETE FROM current")
+            connection.executemany('INSERT INTO current VALUES (?, ?)', [(kind, key) for kind, key, _ in entities])
+            connection.execute("DELETE FROM knowledge WHERE kind IN ('function', 'class') "
+                               "AND (kind, key) NOT IN (SELECT kind, key FROM current)")
+            connection.executemany('INSERT OR REPLACE INTO knowledge VALUES (?, ?, ?)',
+                                   [(kind, key, json.dumps(value)) for kind, key, value in entities])
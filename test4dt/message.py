@@ -1,3 +1,4 @@
+import math
 import os
 from _ast import arg
 import asyncio
@@ -5,16 +6,24 @@ import json
 
 from tqdm import tqdm
 from test4dt.coverage_message import MyCoverage, CoverageMessage
-from test4dt.embedding import embedder, find_topK_message, function_database
+from test4dt.pytest_pool import pytest_pool
+from test4dt.embedding import embedder, function_database, VectorIndex
 import astor
 
 from test4dt.pycg.pycg import CallGraphGenerator
+from test4dt.pycg.machinery.sources import SourceManager
 from test4dt.pycg import formats
 from typing import List
 from test4dt.gptapi import model
 from test4dt.testcase import TestManager
 from test4dt.utils import *
 from test4dt.recorder import recoder
+from test4dt.scheduler import CallGraphScheduler
+from test4dt.knowledge import KnowledgeStore, get_hash
+from test4dt.checkpoint import Checkpoint
+from test4dt.precheck import FastChecker, get_module_names
+from test4dt.config import config
+from test4dt.budget import RequestCost, RoundBudget, request_cost
 
 
 
@@ -28,14 +37,26 @@ class ProjectMessage:
         self.dir_message = DictionaryMessage(self.root_dir, self, None)
         self.coverage_summary = None
         self.coverage = None
-
-
-    async def init(self):
+        self.knowledge = None
+        if config.use_knowledge:
+            self.knowledge = KnowledgeStore(os.path.join(root_dir, dir_type, '.test4dt', 'knowledge.sqlite'))
+        self.checkpoint = Checkpoint(os.path.join(root_dir, dir_type, '.test4dt', 'checkpoint.json'))
+        self.readme_analyses = {}
+        self.round = 0
+        self.completed = set()
+        self.class_index = None
+        self.fast_checker = None
+        # sources, ASTs and symbol tables shared by the file messages and every call graph pass
+        self.source_manager = SourceManager()
+
+
+    async def init(self, state=None):
         files: [str] = self._get_files()
         for file in files:
             self.file_messages.append(FileMessage(self.root_dir, file, self))
+        self.fast_checker = FastChecker(self.file_messages)
 
-        cg = CallGraphGenerator(files, self.root_dir, -1, 'call-graph')
+        cg = CallGraphGenerator(files, self.root_dir, -1, 'call-graph', self.source_manager)
         cg.analyze()
         formatter = formats.Simple(cg)
         output = formatter.generate()
@@ -45,20 +66,40 @@ class ProjectMessage:
         self.parse_full_members()
         self.parseCG(output)
 
-        await self.dir_message.init()
-        await self.analyze_functions()
-        await self.get_total_what_todo()
-        await self.generate_summary()
-        await self.analyze_each_class()
+        if state is not None:
+            self.checkpoint.restore_readmes(self, state)
+        try:
+            await self.dir_message.init()
+            if self.knowledge is not None:
+                # the keys cover the README analyses, which are only known now
+                self.init_knowledge_keys()
+                self.knowledge.load(self)
+            if state is not None:
+                self.checkpoint.restore(self, state)
+            await self.analyze_functions()
+            await self.get_total_what_todo()
+            await self.generate_summary()
+            await self.analyze_each_class()
+        finally:
+            # the LLM client belongs to this event loop, its connections are closed before asyncio.run closes it
+            await model.aclose()
         self.embedding_class_summary()
         function_database.init(self)
+        if self.knowledge is not None:
+            self.knowledge.save(self)
         self.init_test_path(self.dir_type)
+        pytest_pool.configure(self.root_dir, [file_message.mod_name for file_message in self.file_messages])
         self.coverage = MyCoverage(self.root_dir, self.dir_type, self.source_dir)
+        self.checkpoint.save(self)
 
 
     def generate_once(self):
         asyncio.run(self.generate_test_case())
+        if self.knowledge is not None:
+            self.knowledge.save(self)
         coverage = self.coverage.get_coverage()
+        if config.prune_redundant_tests:
+            self.prune_redundant_tests()
         recoder.score.get_coverage(coverage, self.root_dir.split(os.path.sep)[-1])
         self.coverage_summary = coverage['totals']
         for file_path, file in coverage['files'].items():
@@ -74,6 +115,20 @@ class ProjectMessage:
                             function_message.test_manager.coverage = coverage_message
 
 
+    def prune_redundant_tests(self):
+        # the remaining tests cover every line and arc of these, the coverage stays the same without them
+        redundant = set(self.coverage.find_redundant_tests())
+        pruned = 0
+        for function in self.get_functions():
+            test_manager = function.test_manager
+            for testcase in list(test_manager.testcases):
+                if os.path.relpath(testcase.test_path, self.root_dir) in redundant:
+                    testcase.delete()
+                    test_manager.testcases.remove(testcase)
+                    pruned += 1
+        recoder.add_stat('pruned_redundant_tests', pruned)
+
+
     def find_file_by_mod(self, mod: str):
         for file_message in self.file_messages:
             if file_message.mod_name == mod:
@@ -99,32 +154,86 @@ class ProjectMessage:
         return covered_line, uncovered_line, covered_branch, uncovered_branch
 
 
-    async def generate_test_case(self):
-        num = 0
-        for file_message in self.file_messages:
-            for _ in file_message.functions:
-                    num += 1
-        with tqdm(total=num, desc=f"Generate test cases") as pbar:
-            tasks = []
-            for file_message in self.file_messages:
-                for function in file_message.functions:
-                    tasks.append(self.fetch_data(function, pbar))
-            await asyncio.gather(*tasks)
+    @staticmethod
+    def get_expected_gain(function):
+        test_manager = function.test_manager
+        if test_manager.coverage is None:
+            missing = function.end_line - function.start_line + 1
+        else:
+            missing = len(test_manager.coverage.missing_lines) + test_manager.coverage.get_missing_branches()
+        # share of earlier generations that ended with a kept test, smoothed for functions without history
+        success_rate = (len(test_manager.testcases) + 1) / (test_manager.count + 2)
+        # a test reaching a widely called function also protects its callers
+        fan_in = len({use.source for use in function.used})
+        return missing * success_rate * (1 + math.log1p(fan_in))
 
 
-    async def fetch_data(self, function, pbar):
-        await function.test_manager.generate_test_case()
+    def rank_functions(self):
+        return sorted(self.get_functions(), key=self.get_expected_gain, reverse=True)
+
+
+    async def generate_test_case(self):
+        functions = self.rank_functions()
+        budget = RoundBudget(config.round_request_budget, config.round_token_budget)
+        tasks = []
+        with tqdm(total=len(functions), desc=f"Generate test cases") as pbar:
+            try:
+                pending = set()
+                for function in functions:
+                    if function.unique_name in self.completed:
+                        # already done before the interrupted run was resumed
+                        pbar.update(1)
+                        continue
+                    if budget.is_limited():
+                        # the most promising functions go first, the rest waits for a later round
+                        while pending and not budget.can_start():
+                            _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                        if not budget.can_start():
+                            break
+                    task = asyncio.ensure_future(self.fetch_data(function, pbar, budget, budget.reserve()))
+                    tasks.append(task)
+                    pending.add(task)
+                await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                # the workers and the LLM client belong to this event loop, they have to be gone before asyncio.run closes it
+                await pytest_pool.aclose()
+                await model.aclose()
+        recoder.add_stat('round_requests', budget.spent.requests)
+        recoder.add_stat('round_tokens', budget.spent.tokens)
+        recoder.add_stat('functions_over_budget', sum(1 for function in functions if function.unique_name not in self.completed))
+
+
+    async def fetch_data(self, function, pbar, budget, reservation):
+        cost = RequestCost()
+        request_cost.set(cost)
+        try:
+            await function.test_manager.generate_test_case()
+        finally:
+            budget.pay(reservation, cost)
+        self.completed.add(function.unique_name)
+        if config.checkpoint_interval > 0 and len(self.completed) % config.checkpoint_interval == 0:
+            await self.checkpoint.asave(self)
         pbar.update(1)
 
 
+    def finish_round(self):
+        self.round += 1
+        self.completed = set()
+        self.checkpoint.save(self)
+
+
     def init_test_path(self, dir_type):
         conf_content = f"import sys\n\ndef pytest_configure(config):\n    sys.path.append(\'{self.root_dir}\')"
         test_dir = self.root_dir + os.path.sep + dir_type
-        if not os.path.exists(test_dir):
-            os.makedirs(test_dir, exist_ok=True)
-            with open(self.root_dir + os.path.sep + dir_type + os.path.sep + '__init__.py', 'w'):
+        # the directory may already exist because the knowledge store lives in it
+        os.makedirs(test_dir, exist_ok=True)
+        if not os.path.exists(test_dir + os.path.sep + '__init__.py'):
+            with open(test_dir + os.path.sep + '__init__.py', 'w'):
                 pass
-            with open(self.root_dir + os.path.sep + dir_type + os.path.sep + 'conftest.py', 'w') as f:
+        if not os.path.exists(test_dir + os.path.sep + 'conftest.py'):
+            with open(test_dir + os.path.sep + 'conftest.py', 'w') as f:
                 f.write(conf_content)
         for file_message in self.file_messages:
             for function in file_message.functions:
@@ -213,29 +322,83 @@ class ProjectMessage:
         return num
 
 
-    async def analyze_functions(self):
-        num = 0
+    def get_functions(self):
+        functions: List[FunctionMessage] = []
         for file_message in self.file_messages:
-            for _ in file_message.functions:
-                num += 1
-        with tqdm(total=num, desc=f"Analyze functions") as pbar:
-            for file_message in self.file_messages:
-                for function_message in file_message.functions:
-                    await function_message.analyze_done_what()
-                    pbar.update(1)
+            functions.extend(file_message.functions)
+        return functions
 
 
-    async def get_total_what_todo(self):
-        num = 0
+    def init_knowledge_keys(self):
+        # done_what is built from every function a function reaches through its callees, and what_todo
+        # is propagated from every function that reaches it through its callers
+        scheduler = CallGraphScheduler(self.get_functions())
+        downward, upward = scheduler.get_reach_hashes(
+            lambda function: get_hash(function.get_code_hash(), function.find_readme()),
+            lambda parts: get_hash(*parts))
+        for function in scheduler.functions:
+            component = scheduler.component_of[function]
+            function.knowledge_key = get_hash(function.get_code_hash(), function.find_readme(),
+                                              downward[component], upward[component])
+
+
+    def get_classes(self):
+        classes: List[ClassMessage] = []
         for file_message in self.file_messages:
-            for _ in file_message.functions:
-                num += 1
-        with tqdm(total=num, desc=f"Analyze functions") as pbar:
-            for file_message in self.file_messages:
-                for function_message in file_message.functions:
-                    if len(function_message.used) == 0:
-                        await function_message.analyze_what_todo(function_message.find_readme(), False)
-                    pbar.update(1)
+            classes.extend(file_message.classes)
+        return classes
+
+
+    async def analyze_functions(self):
+        scheduler = CallGraphScheduler(self.get_functions())
+        stage_sizes = scheduler.get_stage_sizes()
+        stage_done = [0] * len(stage_sizes)
+        recoder.set_stat('call_graph_components', len(scheduler.components))
+        recoder.set_stat('call_graph_critical_path', scheduler.get_critical_path())
+        recoder.set_stat('call_graph_stage_sizes', stage_sizes)
+        with tqdm(total=len(scheduler.functions), desc=f"Analyze functions") as pbar:
+            def on_done(component, stage):
+                stage_done[stage] += 1
+                finished = 0
+                while finished < len(stage_sizes) and stage_done[finished] == stage_sizes[finished]:
+                    finished += 1
+                pbar.set_postfix(stages=f"{finished}/{len(stage_sizes)}")
+                pbar.update(len(component))
+
+            await scheduler.run(FunctionMessage.analyze_done_what, config.analyze_width, on_done)
+
+
+    async def get_total_what_todo(self):
+        # propagate intents top-down from the functions nobody calls, one call-graph level at a time.
+        # A callee is claimed by the first caller of the shallowest level that reaches it (in file order),
+        # so it is asked about once and the prompts stay the same from run to run.
+        functions = self.get_functions()
+        frontier = [function_message for function_message in functions if len(function_message.used) == 0]
+        claimed = set(frontier)
+
+        async def analyze_root(function_message: FunctionMessage):
+            if function_message.what_todo is not None:
+                return
+            function_message.what_todo = await function_message.analyze_what_todo_by_readme(
+                function_message.find_readme())
+
+        async def analyze_callee(use: CGEdge):
+            if use.dest.what_todo is None:
+                use.dest.what_todo = await use.source.analyze_call_what_todo(use)
+
+        with tqdm(total=len(functions), desc=f"Analyze functions") as pbar:
+            await asyncio.gather(*[analyze_root(function_message) for function_message in frontier])
+            while frontier:
+                uses: List[CGEdge] = []
+                for function_message in frontier:
+                    for use in function_message.uses:
+                        if use.dest not in claimed:
+                            claimed.add(use.dest)
+                            uses.append(use)
+                await asyncio.gather(*[analyze_callee(use) for use in uses])
+                pbar.update(len(frontier))
+                frontier = [use.dest for use in uses]
+            pbar.update(len(functions) - len(claimed))
 
 
     async def generate_summary(self):
@@ -272,9 +435,11 @@ class ProjectMessage:
 
 
     def embedding_class_summary(self):
-        for file_message in self.file_messages:
-            for class_message in file_message.classes:
-                class_message.vector = embedder.embed_query(class_message.summary)
+        missing = [class_message for class_message in self.get_classes() if class_message.vector is None]
+        vectors = embedder.embed_documents([class_message.summary for class_message in missing])
+        for class_message, vector in zip(missing, vectors):
+            class_message.vector = vector
+        self.class_index = VectorIndex(self.get_classes())
 
 
 
@@ -301,7 +466,7 @@ class DictionaryMessage:
                 elif item_path.endswith('README.md'):
                     with open(item_path, 'r') as f:
                         readme = f.read()
-                        self.readme = await self.analyze_readme(readme)
+                    self.readme = await self.get_readme_analysis(readme)
 
 
     def find_readme(self):
@@ -312,6 +477,20 @@ class DictionaryMessage:
         return None
 
 
+    async def get_readme_analysis(self, readme: str):
+        key = get_hash(readme)
+        knowledge = self.project.knowledge
+        analysis = self.project.readme_analyses.get(key)
+        if not analysis and knowledge is not None:
+            analysis = knowledge.get('readme', key)
+        if not analysis:
+            analysis = await self.analyze_readme(readme)
+            if knowledge is not None and analysis:
+                knowledge.put('readme', key, analysis)
+        self.project.readme_analyses[key] = analysis
+        return analysis
+
+
     async def analyze_readme(self, readme: str):
         sys_prompt = """You are tasked with analyzing the contents of a README.md file and providing a clear, 
 concise summary of what the project is about. 
@@ -321,7 +500,7 @@ Avoid excessive details and aim for a brief summary that clearly conveys the pro
         user_prompt = f"""Please analyze the following README.md file and provide a summary that describes what the project aims to do.
 {readme}
 """
-        return await model.aask(sys_prompt, user_prompt)
+        return await model.aask(sys_prompt, user_prompt, default="", cache=True)
 
 
 
@@ -334,6 +513,8 @@ class FileMessage:
         self.imports: List[FileMessage] = [self]
         self.classes: List[ClassMessage] = []
         self.functions: List[FunctionMessage] = []
+        self.top_level_names = set()
+        self.dynamic_names = False
         self.extract_classes_functions_with_comments(file_path)
         self.father = None
 
@@ -357,9 +538,10 @@ class FileMessage:
 
 
     def extract_classes_functions_with_comments(self, file_path: str):
-        with open(file_path, 'r', encoding='utf-8') as f:
-            code = f.read()
-        tree = ast.parse(code, filename=file_path)
+        source = self.project.source_manager.get(file_path)
+        code = source.get_contents()
+        tree = source.get_tree()
+        self.top_level_names, self.dynamic_names = get_module_names(tree)
         visitor = ParentNodeVisitor()
         visitor.visit(tree)
 
@@ -422,6 +604,20 @@ class ClassMessage:
     def get_how_to_use(self):
         return self.how_to_use
 
+    def get_knowledge_key(self):
+        # the prompts carry the summaries of the methods, which depend on everything the methods reach
+        return get_hash(self.full_name, self.class_code,
+                        *sorted(function.get_knowledge_key() for function in self.functions))
+
+    def to_knowledge(self):
+        return {'summary': self.summary, 'how_to_use': self.how_to_use, 'vector': self.vector}
+
+    def load_knowledge(self, value):
+        self.summary = value.get('summary') or None
+        self.how_to_use = value.get('how_to_use') or None
+        if self.summary is not None:
+            self.vector = value.get('vector')
+
     def suit_members(self, members: List[str]):
         count = 0
         for member in members:
@@ -430,6 +626,9 @@ class ClassMessage:
         return count
 
     async def generate_summary(self, pbar):
+        if self.summary is not None:
+            pbar.update(1)
+            return
         sys_prompt = """You are an AI assistant skilled in analyzing Python code. 
 Your task is to determine the role and purpose of a given class by analyzing its structure, methods, and usage.
 Focus on explaining what responsibilities this class has, how it interacts with other components, 
@@ -442,10 +641,13 @@ Here is a Python class:
 
 {self.get_code_with_summary()}
 """
-        self.summary = await model.aask(sys_prompt, user_prompt)
+        self.summary = await model.aask(sys_prompt, user_prompt, default="", cache=True)
         pbar.update(1)
 
     async def generate_how_to_use(self, pbar):
+        if self.how_to_use is not None:
+            pbar.update(1)
+            return
         sys_prompt = """You are an expert in analyzing Python code. 
 Your task is to examine the given class definition and provide a detailed explanation of how to initialize and use this class. 
 Your response should include:
@@ -464,7 +666,7 @@ Here is the Python class definition:
 ```python
 {self.get_code_with_summary()}
 """
-        self.how_to_use = await model.aask(sys_prompt, user_prompt)
+        self.how_to_use = await model.aask(sys_prompt, user_prompt, default="", cache=True)
         pbar.update(1)
 
 
@@ -516,8 +718,11 @@ class FunctionMessage:
         self.start_line = node.lineno
         self.end_line = max(child.lineno for child in ast.walk(node) if hasattr(child, 'lineno'))
         self.standard_code = astor.to_source(node)
-        self.code = get_origin_code(file_path, self.start_line, self.end_line)
+        lines = self.file.project.source_manager.get(file_path).get_lines()
+        self.code = '\n'.join(lines[self.start_line - 1: self.end_line])
         self.module_name = f"{module_name}.{self.func_name}"
+        # a property getter and setter, or nested functions, share the module name but not the line
+        self.unique_name = f"{self.module_name}:{self.start_line}"
         self.uses: List[CGEdge] = []
         self.used: List[CGEdge] = []
 
@@ -526,9 +731,50 @@ class FunctionMessage:
         self.summary = None
         self.params: List[ArgMessage] = []
         self.judge = None
+        self.vector = None
+        self.knowledge_key = None
         self.test_manager = TestManager(self, self.file.project.dir_type)
 
 
+    def get_code_hash(self):
+        parts = [self.module_name, self.code]
+        if self.parent is not None:
+            parts.append(self.parent.class_code)
+            if self.parent.init_method is not None:
+                parts.append(self.parent.init_method.code)
+        return get_hash(*parts)
+
+
+    def get_knowledge_key(self):
+        # a function is reanalyzed when its own code, or the code or README of any function it reaches
+        # through its callees or callers changes, see ProjectMessage.init_knowledge_keys
+        return self.knowledge_key
+
+
+    def to_knowledge(self):
+        return {
+            'done_what': self.done_what,
+            'what_todo': self.what_todo,
+            'summary': self.summary,
+            'judge': self.judge,
+            'vector': self.vector,
+            'params': {param.name: param.to_knowledge() for param in self.params}
+        }
+
+
+    def load_knowledge(self, value):
+        self.done_what = value.get('done_what') or None
+        self.what_todo = value.get('what_todo') or None
+        self.summary = value.get('summary') or None
+        self.judge = value.get('judge') or None
+        if self.summary is not None:
+            self.vector = value.get('vector')
+        params = value.get('params', {})
+        for param in self.params:
+            if param.name in params:
+                param.load_knowledge(params[param.name])
+
+
     def get_code_with_summary(self):
         return f"""
 \"\"\"
@@ -552,6 +798,9 @@ test case:
 
 
     async def generate_summary(self, pbar):
+        if self.summary is not None:
+            pbar.update(1)
+            return
         sys_prompt = """You are an AI assistant skilled in analyzing and generating comprehensive function documentation. 
 Your task is to integrate two different perspectives of docstrings—one describing what the function does (implementation perspective) 
 and the other describing what the function is intended to do (requirement perspective)—along with the function's source code to generate a final, 
@@ -582,7 +831,7 @@ Generate the final docstring accordingly.
 ### "What it is intended to do" Docstring:
 {self.what_todo}
 """
-        self.summary = await model.aask(sys_prompt, user_prompt)
+        self.summary = await model.aask(sys_prompt, user_prompt, default="", cache=True)
         pbar.update(1)
 
 
@@ -673,7 +922,7 @@ Let's think step by step, only output the docstring content. Do not include the
 Please analyze this and generate an appropriate docstring for the provided function. \
 Be sure to explain what the function does and include examples or instructions on how to use it.\n\n\
 source code: \n{source_code}\n\n functions it calls: \n{call_message}"
-        self.done_what = await model.aask(sys_prompt, user_prompt)
+        self.done_what = await model.aask(sys_prompt, user_prompt, default="", cache=True)
         return self.done_what
 
 
@@ -716,19 +965,12 @@ Ensure the docstring follows proper formatting.
 \"\"\"
 {self.code}
 """
-        return await model.aask(sys_prompt, user_prompt)
-
+        return await model.aask(sys_prompt, user_prompt, default="", cache=True)
 
-    async def analyze_what_todo(self, what_todo, is_judge: bool):
-        if is_judge:
-            self.what_todo = what_todo
-        else:
-            self.what_todo = await self.analyze_what_todo_by_readme(what_todo)
 
-        for use in self.uses:
-            dest: FunctionMessage = use.dest
-            if dest.what_todo is None:
-                sys_prompt = """You are a Python code analysis assistant.
+    async def analyze_call_what_todo(self, use):
+        dest: FunctionMessage = use.dest
+        sys_prompt = """You are a Python code analysis assistant.
 Your task is to analyze a function call in the provided source code and produce a precise docstring that describes:
 The purpose of the called function.
 The semantic roles and exact parameter types, inferred from the call context and callee behavior.
@@ -737,7 +979,7 @@ Infer parameter types based on their usage and data flow, not just their names.
 
 Output only the docstring content — do not include the source code or any extra explanations.
 Think step by step before writing the final docstring."""
-                user_prompt = f"""Identify the purpose of the called function {dest.func_name} and explain how to use it, formatted as a Python docstring.
+        user_prompt = f"""Identify the purpose of the called function {dest.func_name} and explain how to use it, formatted as a Python docstring.
 Source Code:
 \"\"\"
 {self.what_todo}
@@ -748,8 +990,7 @@ Function Call:
 At line {use.line_no}, the function call of function {dest.func_name} occurs:
 {use.call_code}
 """
-                call_what_todo = await model.aask(sys_prompt, user_prompt)
-                await dest.analyze_what_todo(call_what_todo, True)
+        return await model.aask(sys_prompt, user_prompt, default="", cache=True)
 
 
     async def judge_params(self):
@@ -775,7 +1016,7 @@ params:
 """
         for param in self.params:
             user_prompt += await param.get_type_help()
-        self.judge = await model.aask(sys_prompt, user_prompt)
+        self.judge = await model.aask(sys_prompt, user_prompt, cache=True)
 
 
 class CGEdge:
@@ -816,6 +1057,17 @@ class ArgMessage:
         self.extract_type: str = ""
 
 
+    def to_knowledge(self):
+        return {'is_user_defined': self.is_user_defined, 'meaning': self.meaning, 'vector': self.vector}
+
+
+    def load_knowledge(self, value):
+        self.is_user_defined = value.get('is_user_defined')
+        self.meaning = value.get('meaning') or None
+        # the vector is only kept together with the meaning it was computed from
+        self.vector = value.get('vector') if self.meaning is not None else None
+
+
     async def get_type_help(self):
         return f"""
 {self.name}: 
@@ -839,6 +1091,8 @@ class ArgMessage:
         if self.is_user_defined:
             if self.meaning is None:
                 self.meaning = await self.generate_meaning()
+                self.vector = None
+            if self.vector is None:
                 self.vector = embedder.embed_query(self.meaning)
             return self.find_type_by_RAG()
         return "build-in type"
@@ -846,7 +1100,7 @@ class ArgMessage:
 
     def find_type_by_RAG(self):
         classes = self.filter_by_members()
-        found_classes = find_topK_message(self.func.file.file_path+self.func.func_name+self.name, classes, self.vector, 3)
+        found_classes = self.func.file.project.class_index.query(self.vector, 3, classes)
         # TODO: change to choose on from k
         result = ""
         for found_class in found_classes:
@@ -884,7 +1138,7 @@ Here is a Python function:
 \"\"\"
 {self.code}
 """
-        return await model.aask(sys_prompt, user_prompt)
+        return await model.aask(sys_prompt, user_prompt, cache=True)
 
 
     async def judge_type(self):
@@ -909,4 +1163,4 @@ Determine the classification of the parameter named {self.name} based on its usa
 \"\"\"
 {self.code}
 """
-        return not (await model.aask(sys_prompt, user_prompt)).__contains__('<1>')
+        return not (await model.aask(sys_prompt, user_prompt, cache=True)).__contains__('<1>')
@@ -0,0 +1,144 @@
+import ast
+import builtins
+import sys
+from typing import List, Set, Tuple
+
+MODULE_NAMES = {'__file__', '__builtins__', '__cached__', '__path__', '__annotations__'}
+# bound implicitly in class bodies and methods
+CLASS_NAMES = {'__class__', '__qualname__', '__module__'}
+# pattern matching only exists from Python 3.10 on
+MATCH_CAPTURES = tuple(getattr(ast, name) for name in ('MatchAs', 'MatchStar') if hasattr(ast, name))
+MATCH_MAPPINGS = tuple(getattr(ast, name) for name in ('MatchMapping',) if hasattr(ast, name))
+
+
+def get_bound_names(statements) -> Set[str]:
+    names = set()
+    for statement in statements:
+        if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(statement.name)
+            continue
+        if isinstance(statement, (ast.Import, ast.ImportFrom)):
+            for alias in statement.names:
+                names.add(alias.asname or alias.name.split('.')[0])
+            continue
+        # assignments nested in if/try/for/with blocks bind module level names as well
+        for node in ast.walk(statement):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+                names.add(node.id)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                names.add(node.name)
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                for alias in node.names:
+                    names.add(alias.asname or alias.name.split('.')[0])
+    return names
+
+
+def get_module_names(tree: ast.Module) -> Tuple[Set[str], bool]:
+    """Top level names of a module, and whether it may define names the AST does not show."""
+    names = get_bound_names(tree.body)
+    dynamic = '__getattr__' in names
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and any(alias.name == '*' for alias in node.names):
+            dynamic = True
+        elif isinstance(node, ast.Name) and node.id in ('globals', 'exec', 'eval'):
+            dynamic = True
+    return names, dynamic
+
+
+class FastChecker:
+    """In-process checks for the errors pylint --errors-only reports most often on generated tests.
+
+    Only reports what is certainly wrong, pylint still runs when nothing is found.
+    """
+
+    def __init__(self, file_messages):
+        self.modules = {file_message.mod_name: file_message for file_message in file_messages}
+        self.packages = set()
+        for mod_name in self.modules:
+            parts = mod_name.split('.')
+            for index in range(1, len(parts) + 1):
+                self.packages.add('.'.join(parts[:index]))
+        # a project module shadowing the standard library is not judged, the import may mean either
+        self.roots = {mod_name.split('.')[0] for mod_name in self.modules} - set(getattr(sys, 'stdlib_module_names', ()))
+
+    def check(self, code: str, path: str) -> List[str]:
+        try:
+            tree = ast.parse(code, filename=path)
+            compile(tree, path, 'exec')
+        except SyntaxError as e:
+            return [f"{path}:{e.lineno or 0}:{e.offset or 0}: E0001: Parsing failed: '{e.msg}' (syntax-error)"]
+        except ValueError as e:
+            return [f"{path}:0:0: E0001: Parsing failed: '{e}' (syntax-error)"]
+        return self.check_imports(tree, path) + self.check_undefined_names(tree, path)
+
+    def is_project_module(self, name: str) -> bool:
+        return name.split('.')[0] in self.roots
+
+    def check_imports(self, tree: ast.Module, path: str) -> List[str]:
+        messages = []
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    if self.is_project_module(alias.name) and alias.name not in self.packages:
+                        messages.append(f"{path}:{node.lineno}:{node.col_offset}: E0401: "
+                                        f"Unable to import '{alias.name}' (import-error)")
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module is not None:
+                if not self.is_project_module(node.module):
+                    continue
+                if node.module not in self.packages:
+                    messages.append(f"{path}:{node.lineno}:{node.col_offset}: E0401: "
+                                    f"Unable to import '{node.module}' (import-error)")
+                    continue
+                file_message = self.modules.get(node.module)
+                if file_message is not None and file_message.dynamic_names:
+                    continue
+                names = file_message.top_level_names if file_message is not None else set()
+                for alias in node.names:
+                    if alias.name == '*' or alias.name in names or f'{node.module}.{alias.name}' in self.packages:
+                        continue
+                    messages.append(f"{path}:{node.lineno}:{node.col_offset}: E0611: "
+                                    f"No name '{alias.name}' in module '{node.module}' (no-name-in-module)")
+        return messages
+
+    @staticmethod
+    def check_undefined_names(tree: ast.Module, path: str) -> List[str]:
+        # scopes are ignored, a name bound anywhere in the file counts as defined everywhere
+        bound = set(dir(builtins)) | MODULE_NAMES | CLASS_NAMES
+        loads = []
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name):
+                if isinstance(node.ctx, ast.Load):
+                    loads.append(node)
+                else:
+                    bound.add(node.id)
+            elif isinstance(node, ast.arg):
+                bound.add(node.arg)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                bound.add(node.name)
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                for alias in node.names:
+                    if alias.name == '*':
+                        return []
+                    bound.add(alias.asname or alias.name.split('.')[0])
+            elif isinstance(node, ast.ExceptHandler) and node.name is not None:
+                bound.add(node.name)
+            elif isinstance(node, (ast.Global, ast.Nonlocal)):
+                bound.update(node.names)
+            elif isinstance(node, MATCH_CAPTURES) and node.name is not None:
+                bound.add(node.name)
+            elif isinstance(node, MATCH_MAPPINGS) and node.rest is not None:
+                bound.add(node.rest)
+        if 'globals' in {node.id for node in loads} or 'exec' in {node.id for node in loads}:
+            return []
+        messages = []
+        reported = set()
+        for node in loads:
+            if node.id in bound or node.id in reported:
+                continue
+            # other implicit names depend on the scope, pylint judges them
+            if node.id.startswith('__') and node.id.endswith('__'):
+                continue
+            reported.add(node.id)
+            messages.append(f"{path}:{node.lineno}:{node.col_offset}: E0602: "
+                            f"Undefined variable '{node.id}' (undefined-variable)")
+        return messages
@@ -0,0 +1,13 @@
+class ChangeCounter(object):
+    """Counts the real changes to definitions, scopes and classes"""
+
+    def __init__(self):
+        self.version = 0
+
+    def bump(self):
+        self.version += 1
+
+    def get(self):
+        return self.version
+
+changes = ChangeCounter()
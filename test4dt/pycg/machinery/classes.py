@@ -18,6 +18,9 @@
 # specific language governing permissions and limitations
 # under the License.
 #
+from test4dt.pycg.machinery.changes import changes
+from test4dt.pycg import utils
+
 class ClassManager:
     def __init__(self):
         self.names = {}
@@ -30,24 +33,33 @@ class ClassManager:
         if not name in self.names:
             cls = ClassNode(name, module)
             self.names[name] = cls
+            changes.bump()
         return self.names[name]
 
     def get_classes(self):
         return self.names
 
 class ClassNode:
+    __slots__ = ('ns', 'module', 'mro', 'cleared_mro')
+
     def __init__(self, ns, module):
+        ns = utils.intern_ns(ns)
         self.ns = ns
         self.module = module
         self.mro = [ns]
+        # the MRO before clear_mro, the rebuilt one is compared to it in compute_mro
+        self.cleared_mro = None
 
     def add_parent(self, parent):
+        old_mro = self.mro.copy()
         if isinstance(parent, str):
             self.mro.append(parent)
         elif isinstance(parent, list):
             for item in parent:
                 self.mro.append(item)
         self.fix_mro()
+        if self.cleared_mro is None and self.mro != old_mro:
+            changes.bump()
 
     def fix_mro(self):
         new_mro = []
@@ -64,6 +76,8 @@ class ClassNode:
         return self.module
 
     def compute_mro(self):
+        old_mro = self.mro.copy() if self.cleared_mro is None else self.cleared_mro
+        self.cleared_mro = None
         res = []
         self.mro.reverse()
         for parent in self.mro:
@@ -72,6 +86,10 @@ class ClassNode:
 
         res.reverse()
         self.mro = res
+        if self.mro != old_mro:
+            changes.bump()
 
     def clear_mro(self):
+        if self.cleared_mro is None:
+            self.cleared_mro = self.mro
         self.mro = [self.ns]
@@ -19,11 +19,14 @@
 # under the License.
 #
 from test4dt.pycg.machinery.pointers import NamePointer, LiteralPointer
+from test4dt.pycg.machinery.changes import changes
 from test4dt.pycg import utils
 
 class DefinitionManager(object):
     def __init__(self):
         self.defs = {}
+        # reverse dependency edges of complete_definitions: ns -> the definitions that read it
+        self.dependents = {}
 
     def create(self, ns, def_type):
         if not ns or not isinstance(ns, str):
@@ -34,16 +37,19 @@ class DefinitionManager(object):
             raise DefinitionError("Definition already exists")
 
         self.defs[ns] = Definition(ns, def_type)
+        changes.bump()
         return self.defs[ns]
 
     def assign(self, ns, defi):
         self.defs[ns] = Definition(ns, defi.get_type())
+        changes.bump()
         self.defs[ns].merge(defi)
 
         # if it is a function def, we need to create a return pointer
         if defi.is_function_def():
             return_ns = utils.join_ns(ns, utils.constants.RETURN_NAME)
             self.defs[return_ns] = Definition(return_ns, utils.constants.NAME_DEF)
+            changes.bump()
             self.defs[return_ns].get_name_pointer().add(
                 utils.join_ns(defi.get_ns(), utils.constants.RETURN_NAME))
 
@@ -110,28 +116,52 @@ class DefinitionManager(object):
 
     def complete_definitions(self):
         # THE MOST expensive part of this tool's process
-        # TODO: IMPROVE COMPLEXITY
+        # Sweeps keep their order and stop at the first sweep that changes nothing, but a definition
+        # is only visited again when a definition it read has changed since, or its last visit wrote
+        # something or skipped an update. Visiting any other definition would change nothing.
+        self.dependents = {}
+        dirty = set(self.defs)
+
+        def read(ns, reader):
+            if not ns in self.dependents:
+                self.dependents[ns] = set()
+            self.dependents[ns].add(reader)
+
+        def changed(ns):
+            # a definition always reads itself
+            dirty.add(ns)
+            if ns in self.dependents:
+                dirty.update(self.dependents[ns])
+
+        def fills_arg(pointer, pos, arg_name, arg):
+            # an empty argument only changes the pointer when it has no slot for it yet
+            if arg:
+                return True
+            if pos is None:
+                return not arg_name in pointer.get_args()
+            name = pointer.get_pos_names().get(pos, None)
+            return not name or pointer.get_pos_of_name(name) != pos or not name in pointer.get_args()
+
         def update_pointsto_args(pointsto_args, arg, name):
             changed_something = False
+            wrote = False
             if arg == pointsto_args:
-                return False
+                return False, False
             for pointsto_arg in pointsto_args:
                 if not self.defs.get(pointsto_arg, None):
                     continue
                 if pointsto_arg == name:
                     continue
+                read(pointsto_arg, name)
                 pointsto_arg_def = self.defs[pointsto_arg].get_name_pointer()
-                if pointsto_arg_def == pointsto_args:
-                    continue
 
                 # sometimes we may end up with a cycle
                 if pointsto_arg in arg:
                     arg.remove(pointsto_arg)
+                    changed(name)
+                    wrote = True
 
                 for item in arg:
-                    if not item in pointsto_arg_def.get():
-                        if self.defs.get(item, None) != None:
-                            changed_something = True
                     # HACK: this check shouldn't be needed
                     # if we remove this the following breaks:
                     # x = lambda x: x + 1
@@ -139,16 +169,26 @@ class DefinitionManager(object):
                     # since on line 184 we don't discriminate between literal values and name values
                     if not self.defs.get(item, None):
                         continue
-                    pointsto_arg_def.add(item)
-            return changed_something
+                    if not item in pointsto_arg_def.get():
+                        changed_something = True
+                        wrote = True
+                        pointsto_arg_def.add(item)
+                        changed(pointsto_arg)
+            return changed_something, wrote
 
         for i in range(len(self.defs)):
             changed_something = False
             for ns, current_def in self.defs.items():
+                if not ns in dirty:
+                    continue
+                dirty.discard(ns)
                 # the name pointer of the definition we're currently iterating
                 current_name_pointer = current_def.get_name_pointer()
+                # without arguments there is nothing to propagate
+                if not current_name_pointer.get_args():
+                    continue
+                revisit = False
                 # iterate the names the current definition points to items
-                # for name in current_name_pointer.get():
                 for name in current_name_pointer.get().copy():
 
                     # get the name pointer of the points to name
@@ -157,6 +197,7 @@ class DefinitionManager(object):
                     if name == ns:
                         continue
 
+                    read(name, ns)
                     pointsto_name_pointer = self.defs[name].get_name_pointer()
                     # iterate the arguments of the definition we're currently iterating
                     for arg_name, arg in current_name_pointer.get_args().items():
@@ -164,14 +205,28 @@ class DefinitionManager(object):
                         if not pos is None:
                             pointsto_args = pointsto_name_pointer.get_pos_arg(pos)
                             if not pointsto_args:
+                                if fills_arg(pointsto_name_pointer, pos, arg_name, arg):
+                                    changed(name)
+                                    revisit = True
                                 pointsto_name_pointer.add_pos_arg(pos, None, arg)
                                 continue
                         else:
                             pointsto_args = pointsto_name_pointer.get_arg(arg_name)
                             if not pointsto_args:
+                                if fills_arg(pointsto_name_pointer, pos, arg_name, arg):
+                                    changed(name)
+                                    revisit = True
                                 pointsto_name_pointer.add_arg(arg_name, arg)
                                 continue
-                        changed_something = changed_something or update_pointsto_args(pointsto_args, arg, current_def.get_ns())
+                        # once something changed the sweep skips the remaining updates
+                        if changed_something:
+                            revisit = True
+                            continue
+                        changed_something, wrote = update_pointsto_args(pointsto_args, arg, current_def.get_ns())
+                        revisit = revisit or wrote
+
+                if revisit:
+                    dirty.add(ns)
 
             if not changed_something:
                 break
@@ -186,12 +241,13 @@ class Definition(object):
         utils.constants.EXT_DEF
     ]
 
+    # decorator_names is only set on the function definitions the processing creates
+    __slots__ = ('fullns', 'lit_pointer', 'name_pointer', 'def_type', 'decorator_names')
+
     def __init__(self, fullns, def_type):
-        self.fullns = fullns
-        self.points_to = {
-            "lit": LiteralPointer(),
-            "name": NamePointer()
-        }
+        self.fullns = utils.intern_ns(fullns)
+        self.lit_pointer = LiteralPointer()
+        self.name_pointer = NamePointer()
         self.def_type = def_type
 
     def get_type(self):
@@ -207,10 +263,10 @@ class Definition(object):
         return (self.is_function_def() or self.is_ext_def())
 
     def get_lit_pointer(self):
-        return self.points_to["lit"]
+        return self.lit_pointer
 
     def get_name_pointer(self):
-        return self.points_to["name"]
+        return self.name_pointer
 
     def get_name(self):
         return self.fullns.split(".")[-1]
@@ -219,8 +275,8 @@ class Definition(object):
         return self.fullns
 
     def merge(self, to_merge):
-        for name, pointer in to_merge.points_to.items():
-            self.points_to[name].merge(pointer)
+        self.lit_pointer.merge(to_merge.lit_pointer)
+        self.name_pointer.merge(to_merge.name_pointer)
 
 class DefinitionError(Exception):
     pass
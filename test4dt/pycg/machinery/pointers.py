@@ -18,38 +18,50 @@
 # specific language governing permissions and limitations
 # under the License.
 #
+from test4dt.pycg.machinery.changes import changes
 
 class Pointer(object):
+    __slots__ = ('values',)
+
     def __init__(self):
         self.values = set()
 
     def add(self, item):
-        self.values.add(item)
+        if not item in self.values:
+            self.values.add(item)
+            changes.bump()
 
     def add_set(self, s):
-        self.values = self.values.union(s)
+        values = self.values.union(s)
+        if len(values) != len(self.values):
+            changes.bump()
+        self.values = values
 
     def get(self):
         return self.values
 
     def merge(self, pointer):
-        self.values = self.values.union(pointer.values)
+        self.add_set(pointer.values)
 
 class LiteralPointer(Pointer):
     STR_LIT = "STRING"
     INT_LIT = "INTEGER"
     UNK_LIT = "UNKNOWN"
 
+    __slots__ = ()
+
     # no need to add the actual item
     def add(self, item):
         if isinstance(item, str):
-            self.values.add(item)
+            super().add(item)
         elif isinstance(item, int):
-            self.values.add(item)
+            super().add(item)
         else:
-            self.values.add(self.UNK_LIT)
+            super().add(self.UNK_LIT)
 
 class NamePointer(Pointer):
+    __slots__ = ('pos_to_name', 'name_to_pos', 'args')
+
     def __init__(self):
         super().__init__()
         self.pos_to_name = {}
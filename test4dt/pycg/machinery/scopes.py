@@ -20,6 +20,7 @@
 #
 import symtable
 from test4dt.pycg import utils
+from test4dt.pycg.machinery.changes import changes
 
 class ScopeManager(object):
     """Manages the scope entries"""
@@ -27,7 +28,7 @@ class ScopeManager(object):
     def __init__(self):
         self.scopes = {}
 
-    def handle_module(self, modulename, filename, contents):
+    def handle_module(self, modulename, filename, contents, table=None):
         functions = []
         classes = []
         def process(namespace, parent, table):
@@ -52,7 +53,9 @@ class ScopeManager(object):
             for t in table.get_children():
                 process(fullns, sc, t)
 
-        process(modulename, None, symtable.symtable(contents, filename, compile_type="exec"))
+        if table is None:
+            table = symtable.symtable(contents, filename, compile_type="exec")
+        process(modulename, None, table)
         return {"functions": functions, "classes": classes}
 
     def handle_assign(self, ns, target, defi):
@@ -76,12 +79,15 @@ class ScopeManager(object):
         if not namespace in self.scopes:
             sc = ScopeItem(namespace, parent)
             self.scopes[namespace] = sc
+            changes.bump()
         return self.scopes[namespace]
 
     def get_scopes(self):
         return self.scopes
 
 class ScopeItem(object):
+    __slots__ = ('parent', 'defs', 'def_counts', 'lambda_counter', 'dict_counter', 'list_counter', 'fullns')
+
     def __init__(self, fullns, parent):
         if parent and not isinstance(parent, ScopeItem):
             raise ScopeError("Parent must be a ScopeItem instance")
@@ -91,10 +97,12 @@ class ScopeItem(object):
 
         self.parent = parent
         self.defs = {}
+        # how many names map to each definition, the set of definitions changes when a count starts or ends
+        self.def_counts = {}
         self.lambda_counter = 0
         self.dict_counter = 0
         self.list_counter = 0
-        self.fullns = fullns
+        self.fullns = utils.intern_ns(fullns)
 
     def get_ns(self):
         return self.fullns
@@ -134,11 +142,23 @@ class ScopeItem(object):
         self.list_counter = 0
 
     def add_def(self, name, defi):
+        old_defi = self.defs.get(name, None)
         self.defs[name] = defi
+        if old_defi is not None:
+            if old_defi.get_ns() == defi.get_ns():
+                return
+            self.def_counts[old_defi.get_ns()] -= 1
+            if not self.def_counts[old_defi.get_ns()]:
+                del self.def_counts[old_defi.get_ns()]
+                changes.bump()
+        if not defi.get_ns() in self.def_counts:
+            self.def_counts[defi.get_ns()] = 0
+            changes.bump()
+        self.def_counts[defi.get_ns()] += 1
 
     def merge_def(self, name, to_merge):
         if not name in self.defs:
-            self.defs[name] = to_merge
+            self.add_def(name, to_merge)
             return
 
         self.defs[name].merge_points_to(to_merge.get_points_to())
@@ -0,0 +1,110 @@
+import os
+import ast
+import symtable
+
+DEF_NODES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)
+
+
+def get_node_key(node):
+    return (type(node).__name__, node.lineno, node.col_offset)
+
+
+def get_last_lines(tree):
+    """The last line of every function, lambda and class, in one walk of the module"""
+    # an explicit stack, deeply nested generated code must not hit the recursion limit
+    last_lines = {}
+    order = []
+    stack = [(tree, None)]
+    while stack:
+        node, parent = stack.pop()
+        order.append((node, parent))
+        stack.extend((child, node) for child in ast.iter_child_nodes(node))
+
+    # every node comes after its parent, so backwards all of its descendants are done before it
+    last = {}
+    for node, parent in reversed(order):
+        line = max(last.get(node, 0), getattr(node, "lineno", 0))
+        if isinstance(node, DEF_NODES):
+            last_lines[get_node_key(node)] = line
+        if parent is not None:
+            last[parent] = max(last.get(parent, 0), line)
+    return last_lines
+
+
+
+class SourceItem(object):
+    def __init__(self, filename, contents, stamp):
+        self.filename = filename
+        self.contents = contents
+        self.stamp = stamp
+        self.tree = None
+        self.table = None
+        self.last_lines = None
+        self.lines = None
+
+    def get_contents(self):
+        return self.contents
+
+    def get_lines(self):
+        if self.lines is None:
+            self.lines = self.contents.splitlines()
+        return self.lines
+
+    def get_tree(self):
+        # the processors only read the tree, so every pass can visit the same one
+        if self.tree is None:
+            self.tree = ast.parse(self.contents, self.filename)
+        return self.tree
+
+    def get_symtable(self):
+        if self.table is None:
+            self.table = symtable.symtable(self.contents, self.filename, compile_type="exec")
+        return self.table
+
+    def get_last_lines(self):
+        if self.last_lines is None:
+            self.last_lines = get_last_lines(self.get_tree())
+        return self.last_lines
+
+
+class SourceManager(object):
+    """Reads, parses and builds the symbol table of every module once"""
+
+    def __init__(self):
+        self.sources = {}
+
+    def get(self, filename):
+        filename = os.path.abspath(filename)
+        stat = os.stat(filename)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        item = self.sources.get(filename, None)
+        if item and item.stamp == stamp:
+            return item
+
+        with open(filename, "rt", encoding="utf-8") as f:
+            contents = f.read()
+        # a file touched without changing keeps its tree
+        if item and item.contents == contents:
+            item.stamp = stamp
+            return item
+
+        item = SourceItem(filename, contents, stamp)
+        self.sources[filename] = item
+        return item
+
+    def get_contents(self, filename):
+        return self.get(filename).get_contents()
+
+    def get_tree(self, filename):
+        return self.get(filename).get_tree()
+
+    def get_symtable(self, filename):
+        return self.get(filename).get_symtable()
+
+    def get_last_line(self, filename, node):
+        last_lines = self.get(filename).get_last_lines()
+        key = get_node_key(node)
+        if not key in last_lines:
+            # the node belongs to an older version of the file
+            last_lines = get_last_lines(node)
+        return last_lines[key]
@@ -23,9 +23,10 @@ import os
 
 from test4dt.pycg import utils
 from test4dt.pycg.machinery.definitions import Definition
+from test4dt.pycg.machinery.sources import SourceManager
 
 class ProcessingBase(ast.NodeVisitor):
-    def __init__(self, filename, modname, modules_analyzed):
+    def __init__(self, filename, modname, modules_analyzed, source_manager=None):
         self.modname = modname
 
         self.modules_analyzed = modules_analyzed
@@ -33,13 +34,17 @@ class ProcessingBase(ast.NodeVisitor):
 
         self.filename = os.path.abspath(filename)
 
-        with open(filename, "rt") as f:
-            self.contents = f.read()
+        # without a shared manager the file is read and parsed for this pass only
+        self.source_manager = source_manager if source_manager else SourceManager()
+        self.contents = self.source_manager.get_contents(self.filename)
 
         self.name_stack = []
         self.method_stack = []
         self.last_called_names = None
 
+    def get_tree(self):
+        return self.source_manager.get_tree(self.filename)
+
     def get_modules_analyzed(self):
         return self.modules_analyzed
 
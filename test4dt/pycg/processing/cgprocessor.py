@@ -28,8 +28,8 @@ from test4dt.pycg.machinery.definitions import Definition
 class CallGraphProcessor(ProcessingBase):
     def __init__(self, filename, modname, import_manager,
             scope_manager, def_manager, class_manager,
-            module_manager, call_graph=None, modules_analyzed=None):
-        super().__init__(filename, modname, modules_analyzed)
+            module_manager, call_graph=None, modules_analyzed=None, source_manager=None):
+        super().__init__(filename, modname, modules_analyzed, source_manager)
         # parent directory of file
         self.parent_dir = os.path.dirname(filename)
 
@@ -172,10 +172,11 @@ class CallGraphProcessor(ProcessingBase):
     def analyze_submodules(self):
         super().analyze_submodules(CallGraphProcessor, self.import_manager,
                 self.scope_manager, self.def_manager, self.class_manager, self.module_manager,
-                call_graph=self.call_graph, modules_analyzed=self.get_modules_analyzed())
+                call_graph=self.call_graph, modules_analyzed=self.get_modules_analyzed(),
+                source_manager=self.source_manager)
 
     def analyze(self):
-        self.visit(ast.parse(self.contents, self.filename))
+        self.visit(self.get_tree())
         self.analyze_submodules()
 
     def get_all_reachable_functions(self):
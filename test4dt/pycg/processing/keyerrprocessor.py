@@ -27,8 +27,9 @@ from test4dt.pycg.processing.base import ProcessingBase
 
 class KeyErrProcessor(ProcessingBase):
     def __init__(self, filename, modname, import_manager,
-            scope_manager, def_manager, class_manager, key_errs, modules_analyzed=None):
-        super().__init__(filename, modname, modules_analyzed)
+            scope_manager, def_manager, class_manager, key_errs, modules_analyzed=None,
+            source_manager=None):
+        super().__init__(filename, modname, modules_analyzed, source_manager)
         # parent directory of file
         self.parent_dir = os.path.dirname(filename)
 
@@ -68,10 +69,11 @@ class KeyErrProcessor(ProcessingBase):
     def analyze_submodules(self):
         super().analyze_submodules(KeyErrProcessor, self.import_manager,
                 self.scope_manager, self.def_manager, self.class_manager,
-                self.key_errs, modules_analyzed=self.get_modules_analyzed())
+                self.key_errs, modules_analyzed=self.get_modules_analyzed(),
+                source_manager=self.source_manager)
 
     def analyze(self):
-        self.visit(ast.parse(self.contents, self.filename))
+        self.visit(self.get_tree())
         self.analyze_submodules()
 
     def visit_Lambda(self, node):
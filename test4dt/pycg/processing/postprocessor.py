@@ -26,8 +26,9 @@ from test4dt.pycg import utils
 
 class PostProcessor(ProcessingBase):
     def __init__(self, input_file, modname, import_manager,
-            scope_manager, def_manager, class_manager, module_manager, modules_analyzed=None):
-        super().__init__(input_file, modname, modules_analyzed)
+            scope_manager, def_manager, class_manager, module_manager, modules_analyzed=None,
+            source_manager=None):
+        super().__init__(input_file, modname, modules_analyzed, source_manager)
         self.import_manager = import_manager
         self.scope_manager = scope_manager
         self.def_manager = def_manager
@@ -301,8 +302,9 @@ class PostProcessor(ProcessingBase):
     def analyze_submodules(self):
         super().analyze_submodules(PostProcessor, self.import_manager,
                 self.scope_manager, self.def_manager, self.class_manager,
-                self.module_manager, modules_analyzed=self.get_modules_analyzed())
+                self.module_manager, modules_analyzed=self.get_modules_analyzed(),
+                source_manager=self.source_manager)
 
     def analyze(self):
-        self.visit(ast.parse(self.contents, self.filename))
+        self.visit(self.get_tree())
         self.analyze_submodules()
@@ -29,8 +29,8 @@ from test4dt.pycg.processing.base import ProcessingBase
 class PreProcessor(ProcessingBase):
     def __init__(self, filename, modname,
             import_manager, scope_manager, def_manager, class_manager,
-            module_manager, modules_analyzed=None):
-        super().__init__(filename, modname, modules_analyzed)
+            module_manager, modules_analyzed=None, source_manager=None):
+        super().__init__(filename, modname, modules_analyzed, source_manager)
 
         self.modname = modname
         self.mod_dir = "/".join(self.filename.split("/")[:-1])
@@ -64,7 +64,8 @@ class PreProcessor(ProcessingBase):
     def analyze_submodule(self, modname):
         super().analyze_submodule(PreProcessor, modname,
             self.import_manager, self.scope_manager, self.def_manager, self.class_manager,
-            self.module_manager, modules_analyzed=self.get_modules_analyzed())
+            self.module_manager, modules_analyzed=self.get_modules_analyzed(),
+            source_manager=self.source_manager)
 
     def visit_Module(self, node):
         def iterate_mod_items(items, const):
@@ -92,7 +93,7 @@ class PreProcessor(ProcessingBase):
         if not root_sc:
             # initialize module scopes
             items = self.scope_manager.handle_module(self.modname,
-                self.filename, self.contents)
+                self.filename, self.contents, self.source_manager.get_symtable(self.filename))
 
             root_sc = self.scope_manager.get_scope(self.modname)
             root_defi = self.def_manager.get(self.modname)
@@ -209,15 +210,8 @@ class PreProcessor(ProcessingBase):
         self.visit_Import(node, prefix=node.module, level=node.level)
 
     def _get_last_line(self, node):
-        lines = sorted(list(ast.walk(node)), key=lambda x: x.lineno if hasattr(x, "lineno") else 0, reverse=True)
-        if not lines:
-            return node.lineno
-
-        last = getattr(lines[0], "lineno", node.lineno)
-        if last < node.lineno:
-            return node.lineno
-
-        return last
+        # the last lines of all functions and classes are found in one walk of the module
+        return self.source_manager.get_last_line(self.filename, node)
 
     def _handle_function_def(self, node, fn_name):
         current_def = self.def_manager.get(self.current_ns)
@@ -241,17 +235,19 @@ class PreProcessor(ProcessingBase):
                 if isinstance(decorator, ast.Name) and decorator.id == utils.constants.STATIC_METHOD:
                     is_static_method = True
 
-        if current_def.get_type() == utils.constants.CLS_DEF and not is_static_method and node.args.args:
-            arg_ns = utils.join_ns(fn_def.get_ns(), node.args.args[0].arg)
+        # the tree is shared with the other passes, so the bound argument is skipped instead of removed
+        args = node.args.args
+        if current_def.get_type() == utils.constants.CLS_DEF and not is_static_method and args:
+            arg_ns = utils.join_ns(fn_def.get_ns(), args[0].arg)
             arg_def = self.def_manager.get(arg_ns)
             if not arg_def:
                 arg_def = self.def_manager.create(arg_ns, utils.constants.NAME_DEF)
             arg_def.get_name_pointer().add(current_def.get_ns())
 
             self.scope_manager.handle_assign(fn_def.get_ns(), arg_def.get_name(), arg_def)
-            node.args.args = node.args.args[1:]
+            args = args[1:]
 
-        for pos, arg in enumerate(node.args.args):
+        for pos, arg in enumerate(args):
             arg_ns = utils.join_ns(fn_def.get_ns(), arg.arg)
             name_pointer.add_pos_arg(pos, arg.arg, arg_ns)
             defs_to_create.append(arg_ns)
@@ -372,4 +368,4 @@ class PreProcessor(ProcessingBase):
             self.import_manager.create_node(self.modname)
             self.import_manager.set_filepath(self.modname, self.filename)
 
-        self.visit(ast.parse(self.contents, self.filename))
+        self.visit(self.get_tree())
@@ -33,15 +33,19 @@ from test4dt.pycg.machinery.classes import ClassManager
 from test4dt.pycg.machinery.callgraph import CallGraph
 from test4dt.pycg.machinery.key_err import KeyErrors
 from test4dt.pycg.machinery.modules import ModuleManager
+from test4dt.pycg.machinery.sources import SourceManager
+from test4dt.pycg.machinery.changes import changes
 from test4dt.pycg import utils
 
 class CallGraphGenerator(object):
-    def __init__(self, entry_points, package, max_iter, operation):
+    def __init__(self, entry_points, package, max_iter, operation, source_manager=None):
         self.entry_points = entry_points
         self.package = package
         self.state = None
         self.max_iter = max_iter
         self.operation = operation
+        # every pass visits the same parsed modules
+        self.source_manager = source_manager if source_manager else SourceManager()
         self.setUp()
 
     def setUp(self):
@@ -54,57 +58,18 @@ class CallGraphGenerator(object):
         self.key_errs = KeyErrors()
 
     def extract_state(self):
-        state = {}
-        state["defs"] = {}
-        for key, defi in self.def_manager.get_defs().items():
-            state["defs"][key] = {
-                "names": defi.get_name_pointer().get().copy(),
-                "lit": defi.get_lit_pointer().get().copy()
-            }
-
-        state["scopes"] = {}
-        for key, scope in self.scope_manager.get_scopes().items():
-            state["scopes"][key] = set([x.get_ns() for (_, x) in scope.get_defs().items()])
-
-        state["classes"] = {}
-        for key, ch in self.class_manager.get_classes().items():
-            state["classes"][key] = ch.get_mro().copy()
-        return state
+        # pointers, scopes and classes count their changes, the state is the number of changes so far
+        return changes.get()
 
     def reset_counters(self):
         for key, scope in self.scope_manager.get_scopes().items():
             scope.reset_counters()
 
     def has_converged(self):
-        if not self.state:
+        if self.state is None:
             return False
 
-        curr_state = self.extract_state()
-
-        # check defs
-        for key, defi in curr_state["defs"].items():
-            if not key in self.state["defs"]:
-                return False
-            if defi["names"] != self.state["defs"][key]["names"]:
-                return False
-            if defi["lit"] != self.state["defs"][key]["lit"]:
-                return False
-
-        # check scopes
-        for key, scope in curr_state["scopes"].items():
-            if not key in self.state["scopes"]:
-                return False
-            if scope != self.state["scopes"][key]:
-                return False
-
-        # check classes
-        for key, ch in curr_state["classes"].items():
-            if not key in self.state["classes"]:
-                return False
-            if ch != self.state["classes"][key]:
-                return False
-
-        return True
+        return self.state == changes.get()
 
     def remove_import_hooks(self):
         self.import_manager.remove_hooks()
@@ -144,7 +109,8 @@ class CallGraphGenerator(object):
                     self.import_manager.install_hooks()
 
                 processor = cls(input_file, input_mod,
-                                modules_analyzed=modules_analyzed, *args, **kwargs)
+                                modules_analyzed=modules_analyzed, source_manager=self.source_manager,
+                                *args, **kwargs)
                 processor.analyze()
                 modules_analyzed = modules_analyzed.union(processor.get_modules_analyzed())
 
@@ -152,6 +118,8 @@ class CallGraphGenerator(object):
                     self.remove_import_hooks()
 
     def analyze(self):
+        # the preprocessor runs module after module: definitions are swept in the order they were created,
+        # and the imports of a module copy definitions out of the modules it imports
         self.do_pass(PreProcessor, True,
                 self.import_manager, self.scope_manager, self.def_manager,
                 self.class_manager, self.module_manager)
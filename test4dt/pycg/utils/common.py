@@ -19,6 +19,7 @@
 # under the License.
 #
 import os
+import sys
 
 def get_lambda_name(counter):
     return "<lambda{}>".format(counter)
@@ -32,8 +33,15 @@ def get_list_name(counter):
 def get_int_name(counter):
     return "<int{}>".format(counter)
 
+def intern_ns(ns):
+    # a namespace is held by many definitions, pointers, scopes and MROs, sharing one instance of
+    # it saves memory and lets set and dict lookups match by identity before comparing characters
+    if type(ns) is str:
+        return sys.intern(ns)
+    return ns
+
 def join_ns(*args):
-    return ".".join([arg for arg in args])
+    return intern_ns(".".join([arg for arg in args]))
 
 def to_mod_name(name, package=None):
     return os.path.splitext(name)[0].replace("/", ".")
@@ -0,0 +1,200 @@
+import asyncio
+import atexit
+import json
+import logging
+import os
+import signal
+
+from test4dt.config import config
+
+WORKER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pytest_worker.py')
+# a single result line carries the whole pytest output
+STREAM_LIMIT = 16 * 1024 * 1024
+
+
+class ProcessResult:
+    def __init__(self, returncode, stdout, timed_out=False, hanging_tests=None):
+        self.returncode = returncode
+        self.stdout = stdout
+        self.timed_out = timed_out
+        # node ids of the tests that hung, None when the runner cannot tell
+        self.hanging_tests = hanging_tests
+
+
+class PytestWorker:
+    def __init__(self, process):
+        self.process = process
+        self.ready = False
+
+    @classmethod
+    async def start(cls, python_path, root_dir, modules):
+        process = await asyncio.create_subprocess_exec(python_path, WORKER_PATH, stdin=asyncio.subprocess.PIPE,
+                                                       stdout=asyncio.subprocess.PIPE,
+                                                       stderr=asyncio.subprocess.DEVNULL, limit=STREAM_LIMIT)
+        worker = cls(process)
+        await worker.send({'root_dir': root_dir, 'modules': modules})
+        return worker
+
+    async def send(self, message):
+        self.process.stdin.write((json.dumps(message) + '\n').encode('utf-8'))
+        await self.process.stdin.drain()
+
+    async def receive(self, timeout):
+        line = await asyncio.wait_for(self.process.stdout.readline(), timeout)
+        if not line:
+            raise EOFError('pytest worker exited')
+        return json.loads(line)
+
+    async def run(self, args, timeout, test_timeout=None):
+        if not self.ready:
+            # importing the project may take a while, it is only waited for once
+            await self.receive(config.pytest_worker_startup_timeout)
+            self.ready = True
+        await self.send({'args': args, 'timeout': timeout, 'test_timeout': test_timeout})
+        # the worker kills its child at the timeout, the margin only guards against a stuck worker
+        result = await self.receive(timeout + 5)
+        return ProcessResult(result['returncode'], result['stdout'], result['timed_out'], result['hanging_tests'])
+
+    def kill(self):
+        # also called after the loop of the worker is closed, so signal the pid directly
+        if self.process.returncode is None:
+            try:
+                os.kill(self.process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+
+async def run_process(args, timeout=None, env=None):
+    process = await asyncio.create_subprocess_exec(*args, stdout=asyncio.subprocess.PIPE,
+                                                   stderr=asyncio.subprocess.PIPE, env=env)
+    try:
+        stdout, _ = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        return ProcessResult(-1, '', timed_out=True)
+    return ProcessResult(process.returncode, stdout.decode('utf-8', 'replace'))
+
+
+class PytestPool:
+    """Long-lived pytest workers which import the project once and fork per test file.
+
+    Workers and the semaphore limiting local checks belong to one event loop and are replaced
+    when start.py moves on to the next asyncio.run. Without fork, or when a worker breaks,
+    tests run in a fresh `python -m pytest` process as before.
+    """
+
+    def __init__(self):
+        self.root_dir = None
+        self.modules = []
+        self.size = 0
+        self.loop = None
+        self.semaphore = None
+        self.workers = []
+        self.idle = None
+        self.waiting = 0
+
+    def configure(self, root_dir, modules, size=None):
+        self.close()
+        self.root_dir = root_dir
+        self.modules = list(modules)
+        self.size = config.pytest_workers if size is None else size
+        if not hasattr(os, 'fork'):
+            self.size = 0
+
+    def can_time_tests(self):
+        # only workers time single tests, a new pytest process runs the file under one timeout
+        return self.size > 0
+
+    def disable(self, error):
+        # a worker that cannot start would fail the same way for every check, so it is not tried again
+        logging.error(f'pytest worker failed to start, running tests in new processes: {error}')
+        self.size = 0
+        self.wake_waiting()
+
+    def wake_waiting(self):
+        # checks waiting for a worker that will not come back run in a new process instead
+        while self.waiting > self.idle.qsize():
+            self.idle.put_nowait(None)
+
+    def bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.close()
+            self.loop = loop
+            self.semaphore = asyncio.Semaphore(config.check_concurrency)
+            self.idle = asyncio.Queue()
+            self.waiting = 0
+
+    def get_semaphore(self) -> asyncio.Semaphore:
+        self.bind_loop()
+        return self.semaphore
+
+    async def acquire(self):
+        self.bind_loop()
+        if not self.idle.empty():
+            return self.idle.get_nowait()
+        if len(self.workers) < self.size:
+            # reserve the slot before awaiting, other checks may ask for a worker meanwhile
+            self.workers.append(None)
+            try:
+                worker = await PytestWorker.start(os.getenv('USER_PYTHON_PATH'), self.root_dir, self.modules)
+            except OSError as e:
+                self.workers.remove(None)
+                self.disable(e)
+                return None
+            self.workers[self.workers.index(None)] = worker
+            return worker
+        self.waiting += 1
+        try:
+            return await self.idle.get()
+        finally:
+            self.waiting -= 1
+
+    def release(self, worker, broken=False):
+        if broken:
+            worker.kill()
+            self.workers.remove(worker)
+            self.wake_waiting()
+            return
+        self.idle.put_nowait(worker)
+
+    async def run(self, test_path, report_path, timeout, test_timeout=None):
+        args = [test_path, '--json-report', f'--json-report-file={report_path}']
+        async with self.get_semaphore():
+            if self.size > 0:
+                worker = await self.acquire()
+                if worker is not None:
+                    try:
+                        result = await worker.run(args, timeout, test_timeout)
+                    except (OSError, ValueError, asyncio.TimeoutError, EOFError) as e:
+                        self.release(worker, broken=True)
+                        if worker.ready:
+                            logging.error(f'pytest worker failed, running {test_path} directly: {e}')
+                        else:
+                            self.disable(e)
+                    except BaseException:
+                        # cancelled in the middle of a request, its answer would be read by the next check
+                        self.release(worker, broken=True)
+                        raise
+                    else:
+                        self.release(worker)
+                        return result
+            return await run_process([os.getenv('USER_PYTHON_PATH'), '-m', 'pytest'] + args, timeout)
+
+    def close(self):
+        for worker in self.workers:
+            if worker is not None:
+                worker.kill()
+        self.workers = []
+        self.loop = None
+
+    async def aclose(self):
+        workers = [worker for worker in self.workers if worker is not None]
+        self.close()
+        for worker in workers:
+            await worker.process.wait()
+
+
+pytest_pool = PytestPool()
+atexit.register(pytest_pool.close)
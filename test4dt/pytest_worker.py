@@ -0,0 +1,195 @@
+"""Long-lived pytest worker, started by test4dt.pytest_pool with the interpreter of the project under test.
+
+It imports pytest, its plugins and the project once, then forks a child for every test file it is asked to run,
+so each run starts from the warm, unmodified state. Requests and results are JSON lines on stdin and stdout.
+This file runs outside of test4dt and must only use the standard library.
+"""
+import faulthandler
+import importlib
+import json
+import os
+import select
+import signal
+import sys
+import time
+
+
+def preload(root_dir, modules):
+    # the same sys.path as `python -m pytest` in this working directory, where the conftest.py of
+    # the tests appends the project root: the working directory replaces the directory of this file
+    sys.path[0] = os.getcwd()
+    if root_dir not in sys.path:
+        sys.path.append(root_dir)
+    import pytest  # noqa: F401
+    try:
+        import pytest_jsonreport.plugin  # noqa: F401
+    except ImportError:
+        pass
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except BaseException:
+            # the module fails the same way inside the tests, where pytest reports it
+            pass
+
+
+class TestProgress:
+    """Writes every test start, end and timeout to the progress pipe.
+
+    With a timeout, a test phase running longer fails, so the rest of the file still runs. A test stuck
+    where the alarm cannot interrupt it ends the child through faulthandler, the last started test tells which one.
+    """
+
+    def __init__(self, progress_fd, timeout=None):
+        self.progress_fd = progress_fd
+        self.timeout = timeout
+        self.nodeid = None
+
+    def write(self, event, nodeid):
+        os.write(self.progress_fd, f'{event}\t{nodeid}\n'.encode('utf-8'))
+
+    def on_alarm(self, signum, frame):
+        import pytest
+        self.write('timeout', self.nodeid)
+        pytest.fail(f'Timeout: the test ran longer than {self.timeout}s', pytrace=False)
+
+    def arm(self):
+        signal.signal(signal.SIGALRM, self.on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, self.timeout)
+        faulthandler.dump_traceback_later(self.timeout + 1, exit=True)
+
+    @staticmethod
+    def disarm():
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        faulthandler.cancel_dump_traceback_later()
+
+    def run_phase(self):
+        if self.timeout is None:
+            yield
+            return
+        self.arm()
+        try:
+            yield
+        finally:
+            self.disarm()
+
+    def pytest_runtest_setup(self, item):
+        self.nodeid = item.nodeid
+        self.write('start', item.nodeid)
+
+    def pytest_runtest_logfinish(self, nodeid, location):
+        self.write('end', nodeid)
+
+
+def create_progress_plugins(progress_fd, timeout=None):
+    import pytest
+    plugin = TestProgress(progress_fd, timeout)
+    wrapper = pytest.hookimpl(hookwrapper=True)
+
+    class Phases:
+        # phases run inside pytest's exception handling, so the failure raised by the alarm is reported normally
+        @wrapper
+        def pytest_runtest_setup(self, item):
+            yield from plugin.run_phase()
+
+        @wrapper
+        def pytest_runtest_call(self, item):
+            yield from plugin.run_phase()
+
+        @wrapper
+        def pytest_runtest_teardown(self, item, nextitem):
+            yield from plugin.run_phase()
+
+    return [plugin, Phases()]
+
+
+def run_child(request, write_fd, progress_fd):
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(write_fd, 1)
+    os.dup2(devnull, 2)
+    code = 3
+    try:
+        import pytest
+        plugins = create_progress_plugins(progress_fd, request.get('test_timeout'))
+        code = int(pytest.main(request['args'], plugins=plugins))
+    finally:
+        sys.stdout.flush()
+        os._exit(code)
+
+
+def read_progress(data):
+    started = None
+    hanging = []
+    for line in data.decode('utf-8', 'replace').splitlines():
+        event, _, nodeid = line.partition('\t')
+        if event == 'start':
+            started = nodeid
+        elif event == 'end':
+            started = None
+        elif event == 'timeout' and nodeid not in hanging:
+            hanging.append(nodeid)
+    # a test that started and never ended was running when the child was killed or gave up
+    if started is not None and started not in hanging:
+        hanging.append(started)
+    return hanging
+
+
+def run(request):
+    read_fd, write_fd = os.pipe()
+    progress_read_fd, progress_write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        os.close(progress_read_fd)
+        run_child(request, write_fd, progress_write_fd)
+    os.close(write_fd)
+    os.close(progress_write_fd)
+
+    chunks = {read_fd: [], progress_read_fd: []}
+    open_fds = [read_fd, progress_read_fd]
+    timed_out = False
+    deadline = time.monotonic() + request['timeout']
+    while open_fds:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            timed_out = True
+            break
+        readable, _, _ = select.select(open_fds, [], [], remaining)
+        for fd in readable:
+            data = os.read(fd, 65536)
+            if data:
+                chunks[fd].append(data)
+            else:
+                open_fds.remove(fd)
+    os.close(read_fd)
+    os.close(progress_read_fd)
+    if timed_out:
+        os.kill(pid, signal.SIGKILL)
+    _, status = os.waitpid(pid, 0)
+    returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -1
+    return {
+        'returncode': returncode,
+        'stdout': b''.join(chunks[read_fd]).decode('utf-8', 'replace'),
+        'timed_out': timed_out,
+        'hanging_tests': read_progress(b''.join(chunks[progress_read_fd]))
+    }
+
+
+def main():
+    # user modules may print while they are imported, keep the protocol on a private copy of stdout
+    protocol = os.fdopen(os.dup(1), 'w')
+    os.dup2(os.open(os.devnull, os.O_WRONLY), 1)
+    settings = json.loads(sys.stdin.readline())
+    preload(settings['root_dir'], settings['modules'])
+    protocol.write(json.dumps({'ready': True}) + '\n')
+    protocol.flush()
+    for line in sys.stdin:
+        if line.strip() == '':
+            continue
+        protocol.write(json.dumps(run(json.loads(line))) + '\n')
+        protocol.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -6,14 +6,32 @@ from test4dt.config import config
 class Recoder:
     def __init__(self):
         self.start_time = time.time()
+        # durations only, the start of a running timer is kept apart
         self.times = {}
+        self.started = {}
+        self.stats = {}
         self.score = Score()
 
     def start_count_time(self, name):
-        self.times[name] = time.time()
+        self.started[name] = time.time()
 
     def end_count_time(self, name):
-        self.times[name] = time.time() - self.times[name]
+        # a timer restored from a checkpoint goes on from the duration counted before
+        self.times[name] = self.times.get(name, 0) + time.time() - self.started.pop(name)
+
+    def get_times(self):
+        # running timers count up to now
+        now = time.time()
+        times = dict(self.times)
+        for name, start in self.started.items():
+            times[name] = times.get(name, 0) + now - start
+        return times
+
+    def add_stat(self, name, value=1):
+        self.stats[name] = self.stats.get(name, 0) + value
+
+    def set_stat(self, name, value):
+        self.stats[name] = value
 
     def end(self, project_name):
         end_time = time.time()
@@ -26,6 +44,7 @@ class Recoder:
             json.dump({
                 'time': end_time - self.start_time,
                 'times': self.times,
+                'stats': self.stats,
                 **self.score.to_json()
             }, f)
 
@@ -0,0 +1,137 @@
+import asyncio
+from typing import List
+
+
+class CallGraphScheduler:
+    """Runs a coroutine over the call graph so that callees finish before their callers.
+
+    Strongly connected components are collapsed and their functions run one after another,
+    every component whose callees are done runs concurrently, up to `width` at a time.
+    """
+
+    def __init__(self, functions: List):
+        self.functions = functions
+        self.components: List[List] = []
+        self.component_of = {}
+        self.callees: List[set] = []
+        self.callers: List[set] = []
+        self.stages: List[int] = []
+        self.build()
+
+    def build(self):
+        self.find_components()
+        self.callees = [set() for _ in self.components]
+        self.callers = [set() for _ in self.components]
+        for function in self.functions:
+            source = self.component_of[function]
+            for use in function.uses:
+                dest = self.component_of.get(use.dest)
+                if dest is None or dest == source:
+                    continue
+                self.callees[source].add(dest)
+                self.callers[dest].add(source)
+        # components come out of Tarjan's algorithm callees first,
+        # so the stage of every callee is known before its callers
+        self.stages = [0] * len(self.components)
+        for index in range(len(self.components)):
+            if self.callees[index]:
+                self.stages[index] = max(self.stages[callee] for callee in self.callees[index]) + 1
+
+    def find_components(self):
+        # iterative Tarjan, call graphs of large projects are too deep for recursion
+        order = {function: index for index, function in enumerate(self.functions)}
+        uses = {function: [use.dest for use in function.uses if use.dest in order] for function in self.functions}
+        index_of = {}
+        low_link = {}
+        stack = []
+        on_stack = set()
+        for root in self.functions:
+            if root in index_of:
+                continue
+            work = [(root, 0)]
+            while work:
+                function, position = work.pop()
+                if position == 0:
+                    index_of[function] = low_link[function] = len(index_of)
+                    stack.append(function)
+                    on_stack.add(function)
+                descended = False
+                while position < len(uses[function]):
+                    callee = uses[function][position]
+                    position += 1
+                    if callee not in index_of:
+                        work.append((function, position))
+                        work.append((callee, 0))
+                        descended = True
+                        break
+                    if callee in on_stack:
+                        low_link[function] = min(low_link[function], index_of[callee])
+                if descended:
+                    continue
+                if low_link[function] == index_of[function]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        self.component_of[member] = len(self.components)
+                        component.append(member)
+                        if member is function:
+                            break
+                    component.sort(key=order.get)
+                    self.components.append(component)
+                if work:
+                    caller = work[-1][0]
+                    low_link[caller] = min(low_link[caller], low_link[function])
+
+    def get_critical_path(self) -> int:
+        if not self.stages:
+            return 0
+        return max(self.stages) + 1
+
+    def get_stage_sizes(self) -> List[int]:
+        sizes = [0] * self.get_critical_path()
+        for stage in self.stages:
+            sizes[stage] += 1
+        return sizes
+
+    def get_reach_hashes(self, get_part, combine):
+        """For every component, one hash of all it reaches through its callees and one through its callers.
+
+        Each hash combines the parts of the component with the hashes of its neighbouring components,
+        so a change any number of calls away changes it as well.
+        """
+        downward = [None] * len(self.components)
+        for index, component in enumerate(self.components):
+            downward[index] = combine(sorted(get_part(function) for function in component) +
+                                      sorted(downward[callee] for callee in self.callees[index]))
+        upward = [None] * len(self.components)
+        for index in reversed(range(len(self.components))):
+            upward[index] = combine(sorted(get_part(function) for function in self.components[index]) +
+                                    sorted(upward[caller] for caller in self.callers[index]))
+        return downward, upward
+
+    async def run(self, worker, width: int, on_done=None):
+        semaphore = asyncio.Semaphore(width)
+        waiting = [len(callees) for callees in self.callees]
+
+        async def run_component(index):
+            async with semaphore:
+                for function in self.components[index]:
+                    await worker(function)
+            return index
+
+        pending = {asyncio.ensure_future(run_component(index)) for index, count in enumerate(waiting) if count == 0}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index = task.result()
+                    if on_done is not None:
+                        on_done(self.components[index], self.stages[index])
+                    for caller in self.callers[index]:
+                        waiting[caller] -= 1
+                        if waiting[caller] == 0:
+                            pending.add(asyncio.ensure_future(run_component(caller)))
+        finally:
+            for task in pending:
+                task.cancel()
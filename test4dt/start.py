@@ -11,6 +11,54 @@ parser.add_argument("--source_path", type=str, help="Source path", required=True
 parser.add_argument("--num", type=int, help="The number of rounds for which you want to generate test cases.", default=3)
 parser.add_argument("--type", type=bool, help="Output the extract type of function paras", default=False)
 parser.add_argument("--run_benchmark", type=bool, help="Project under test is in projects.json", default=True)
+parser.add_argument("--no_cache", action="store_true", help="Bypass the on-disk LLM response cache")
+parser.add_argument("--cache_path", type=str, help="Path of the LLM response cache", default=config.cache_path)
+parser.add_argument("--cache_max_size", type=int, help="Maximum size of the LLM response cache in MB",
+                    default=config.cache_max_size // (1024 * 1024))
+parser.add_argument("--llm_concurrency", type=int, help="Maximum number of in-flight LLM requests",
+                    default=config.llm_concurrency)
+parser.add_argument("--llm_pool_size", type=int, help="Size of the LLM HTTP connection pool", default=config.llm_pool_size)
+parser.add_argument("--llm_keepalive", type=float, help="Keep-alive expiry of pooled LLM connections in seconds",
+                    default=config.llm_keepalive)
+parser.add_argument("--no_http2", action="store_true", help="Use HTTP/1.1 for LLM requests")
+parser.add_argument("--llm_mode", "--llm-mode", type=str, choices=['live', 'record', 'replay', 'stub'],
+                    help="live: call the API, record: call the API and write a cassette, "
+                         "replay: answer from the cassette, stub: call a local OpenAI-compatible stub server",
+                    default=config.llm_mode)
+parser.add_argument("--cassette", type=str, help="Cassette file for record, replay and stub modes",
+                    default=config.cassette_path)
+parser.add_argument("--stub_latency", type=str, help="Latency distribution of the stub server, e.g. uniform:0.5,2",
+                    default='constant:0')
+parser.add_argument("--stub_seed", type=int, help="Seed of the stub latency distribution", default=0)
+parser.add_argument("--analyze_width", type=int, help="Maximum number of functions analyzed concurrently",
+                    default=config.analyze_width)
+parser.add_argument("--no_knowledge", action="store_true",
+                    help="Recompute all analyses instead of reusing the project's knowledge store")
+parser.add_argument("--resume", action="store_true", help="Resume the interrupted run from its last checkpoint")
+parser.add_argument("--checkpoint_interval", type=int, help="Checkpoint after every N generated functions",
+                    default=config.checkpoint_interval)
+parser.add_argument("--embed_batch_size", type=int, help="Number of texts embedded per forward pass",
+                    default=config.embed_batch_size)
+parser.add_argument("--pytest_workers", type=int, help="Number of forking pytest workers, 0 runs every test in a new process",
+                    default=config.pytest_workers)
+parser.add_argument("--check_concurrency", type=int, help="Number of test checks running at the same time",
+                    default=config.check_concurrency)
+parser.add_argument("--no_fast_check", action="store_true", help="Always run pylint, without the in-process checks first")
+parser.add_argument("--decline_mode", type=str, choices=['prune', 'bisect'], default=config.decline_mode,
+                    help="Keep a failing test file by dropping its failing tests, or by bisecting over its asserts")
+parser.add_argument("--test_timeout", type=float, default=config.test_timeout,
+                    help="Seconds a single test may run when hanging tests are searched for")
+parser.add_argument("--coverage_workers", type=int, default=config.coverage_workers,
+                    help="Number of parallel processes collecting coverage")
+parser.add_argument("--coverage_contexts", action="store_true",
+                    help="Record which test covers which line and report the marginal coverage of every test file")
+parser.add_argument("--prune_redundant_tests", action="store_true",
+                    help="Delete test files that add no coverage over the rest, implies --coverage_contexts")
+parser.add_argument("--round_request_budget", type=int, default=config.round_request_budget,
+                    help="LLM requests one round of generation may spend, 0 for no limit")
+parser.add_argument("--round_token_budget", type=int, default=config.round_token_budget,
+                    help="LLM tokens one round of generation may spend, 0 for no limit")
+parser.add_argument("--llm_max_retries", type=int, help="Retries of a failed LLM request", default=config.llm_max_retries)
 
 load_dotenv()
 args = parser.parse_args()
@@ -18,6 +66,36 @@ base_dir: str = args.project_path
 source_dir: str = args.source_path
 config.need_extract_type = args.type
 config.run_benchmark = args.run_benchmark
+config.use_cache = not args.no_cache
+config.cache_path = args.cache_path
+config.cache_max_size = args.cache_max_size * 1024 * 1024
+config.llm_concurrency = args.llm_concurrency
+config.llm_pool_size = args.llm_pool_size
+config.llm_keepalive = args.llm_keepalive
+config.llm_http2 = not args.no_http2
+config.llm_max_retries = args.llm_max_retries
+config.llm_mode = args.llm_mode
+config.cassette_path = args.cassette
+config.analyze_width = args.analyze_width
+config.use_knowledge = not args.no_knowledge
+config.checkpoint_interval = args.checkpoint_interval
+config.embed_batch_size = args.embed_batch_size
+config.pytest_workers = args.pytest_workers
+config.check_concurrency = args.check_concurrency
+config.fast_check = not args.no_fast_check
+config.decline_mode = args.decline_mode
+config.test_timeout = args.test_timeout
+config.coverage_workers = args.coverage_workers
+config.coverage_contexts = args.coverage_contexts
+config.prune_redundant_tests = args.prune_redundant_tests
+config.round_request_budget = args.round_request_budget
+config.round_token_budget = args.round_token_budget
+
+if config.llm_mode == 'stub':
+    from test4dt.stub_server import StubServer
+    stub_cassette = args.cassette if os.path.exists(args.cassette) else None
+    stub_server = StubServer(latency=args.stub_latency, cassette_path=stub_cassette, seed=args.stub_seed)
+    config.llm_base_url = stub_server.start()
 
 project_name = base_dir.split(os.path.sep)[-1]
 
@@ -26,15 +104,21 @@ from test4dt.recorder import recoder
 
 recoder.start_count_time('collect_message')
 project = ProjectMessage(base_dir, source_dir)
-asyncio.run(project.init())
+state = None
+if args.resume:
+    state = project.checkpoint.load()
+    if state is None:
+        print('No checkpoint found, starting from scratch')
+asyncio.run(project.init(state))
 recoder.end_count_time('collect_message')
 
 
-for i in range(args.num):
+for i in range(project.round, args.num):
     recoder.start_count_time(f'run_{i}')
     project.generate_once()
     project.get_coverage_message()
     recoder.score.first_run = False
     recoder.end_count_time(f'run_{i}')
+    project.finish_round()
 
 recoder.end(project_name=project_name)
@@ -0,0 +1,122 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from test4dt.cache import ResponseCache
+from test4dt.cassette import Cassette
+
+DEFAULT_COMPLETION = """```python
+def test_stub():
+    assert True
+```"""
+
+
+class LatencyDistribution:
+    def __init__(self, spec: str, seed=None):
+        # "constant:0.5", "uniform:0.2,1.5", "normal:1.0,0.3", "lognormal:0.0,0.5" or "exponential:1.0"
+        self.spec = spec
+        name, _, params = spec.partition(':')
+        self.name = name
+        self.params = [float(param) for param in params.split(',') if param != '']
+        if self.name not in ('constant', 'uniform', 'normal', 'lognormal', 'exponential'):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def sample(self) -> float:
+        with self.lock:
+            if self.name == 'constant':
+                value = self.params[0] if self.params else 0.0
+            elif self.name == 'uniform':
+                value = self.random.uniform(self.params[0], self.params[1])
+            elif self.name == 'normal':
+                value = self.random.gauss(self.params[0], self.params[1])
+            elif self.name == 'lognormal':
+                value = self.random.lognormvariate(self.params[0], self.params[1])
+            else:
+                value = self.random.expovariate(1 / self.params[0])
+        return max(value, 0.0)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_json(404, {'error': {'message': f'{self.path} is not served by the stub'}})
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        model_type = body.get('model', 'stub')
+        key = ResponseCache.get_key(model_type, body.get('temperature', 0.0), body.get('messages', []))
+        content = None
+        if self.server.cassette is not None:
+            content = self.server.cassette.replay(key)
+        if content is None:
+            content = self.server.completion
+        time.sleep(self.server.latency.sample())
+        self.send_json(200, {
+            'id': f'chatcmpl-stub-{key[:12]}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model_type,
+            'choices': [{
+                'index': 0,
+                'finish_reason': 'stop',
+                'message': {'role': 'assistant', 'content': content}
+            }],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+        })
+
+    def send_json(self, status, payload):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, host='127.0.0.1', port=0, latency='constant:0', cassette_path=None,
+                 completion=DEFAULT_COMPLETION, seed=None):
+        super().__init__((host, port), StubHandler)
+        self.latency = LatencyDistribution(latency, seed)
+        self.cassette = Cassette(cassette_path).load() if cassette_path else None
+        self.completion = completion
+        self.thread = None
+
+    def get_base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self.get_base_url()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", type=str, help="Host to bind", default='127.0.0.1')
+    parser.add_argument("--port", type=int, help="Port to bind", default=8765)
+    parser.add_argument("--latency", type=str, help="Latency distribution, e.g. uniform:0.5,2", default='constant:0')
+    parser.add_argument("--cassette", type=str, help="Cassette to answer recorded prompts from", default=None)
+    parser.add_argument("--seed", type=int, help="Seed of the latency distribution", default=None)
+    args = parser.parse_args()
+    server = StubServer(args.host, args.port, args.latency, args.cassette, seed=args.seed)
+    print(f"Serving OpenAI-compatible stub on {server.get_base_url()}")
+    server.serve_forever()
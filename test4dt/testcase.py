@@ -2,11 +2,13 @@ import ast
 import json
 import logging
 import os
-import subprocess
+import tempfile
 from typing import List
 
+from test4dt.config import config
 from test4dt.embedding import function_database
-from test4dt.gptapi import model
+from test4dt.gptapi import model, LLMError
+from test4dt.pytest_pool import pytest_pool, run_process
 from test4dt.recorder import recoder
 from test4dt.utils import get_code
 
@@ -19,13 +21,24 @@ class TestManager:
         self.count = 0
         self.coverage = None
 
+    def restore_testcases(self, test_paths):
+        for test_path in test_paths:
+            if os.path.exists(test_path):
+                self.testcases.append(Testcase(self, self.func, test_path))
+
     def get_test_path(self):
         root_dir = self.func.file.root_dir
         file_path = self.func.file.file_path
         directory = file_path[0:-3] + '_t'
         dirs = directory.split(os.path.sep)
         dirs = dirs[len(root_dir.split(os.path.sep)):]
-        return self.directory + os.path.sep + 'test_' + "_".join(dirs) + self.func.func_name.replace('.', '_') + str(len(self.testcases)) + '.py'
+        prefix = self.directory + os.path.sep + 'test_' + "_".join(dirs) + self.func.func_name.replace('.', '_')
+        # pruned tests leave gaps in the numbering, the next free number must not overwrite a kept test
+        kept = {testcase.test_path for testcase in self.testcases}
+        number = len(self.testcases)
+        while prefix + str(number) + '.py' in kept or os.path.exists(prefix + str(number) + '.py'):
+            number += 1
+        return prefix + str(number) + '.py'
 
     def get_directory(self, dir_type):
         root_dir = self.func.file.root_dir
@@ -43,15 +56,25 @@ class TestManager:
             if len(self.coverage.missing_lines) == 0:
                 return
         test_path = self.get_test_path()
-        await self.func.judge_params()
-        if self.get_first_testcase() != "" and self.coverage is not None:
-            code = await self.generate_test_case_evol()
-        elif self.count > 0 and self.coverage is None:
-            code = await self.generate_test_case_easy()
-        else:
-            code = await self.generate_test_case_normal()
+        try:
+            await self.func.judge_params()
+            if self.get_first_testcase() != "" and self.coverage is not None:
+                code = await self.generate_test_case_evol()
+            elif self.count > 0 and self.coverage is None:
+                code = await self.generate_test_case_easy()
+            else:
+                code = await self.generate_test_case_normal()
+        except LLMError as e:
+            # nothing was generated, so there is nothing to check
+            logging.error(e)
+            return
         testcase = Testcase(self, self.func, test_path, code)
-        if await testcase.assert_check():
+        try:
+            passed = await testcase.assert_check()
+        except LLMError as e:
+            logging.error(e)
+            passed = False
+        if passed:
             self.testcases.append(testcase)
         else:
             testcase.delete()
@@ -246,12 +269,15 @@ Function Code:
 
 
 class Testcase:
-    def __init__(self, test_manager: TestManager, func, test_path: str, code: str):
+    def __init__(self, test_manager: TestManager, func, test_path: str, code: str = None):
         self.test_manager = test_manager
         self.test_path = test_path
         self.func = func
         self.error_message = ""
-        self.set_code(code)
+        self.failed_tests = None
+        self.hanging_tests = None
+        if code is not None:
+            self.set_code(code)
 
     def delete(self):
         try:
@@ -270,12 +296,29 @@ class Testcase:
         with open(self.test_path, 'w') as f:
             f.write(code)
 
-    def find_syntax_error(self):
+    def find_fast_error(self):
+        fast_checker = self.func.file.project.fast_checker
+        if not config.fast_check or fast_checker is None:
+            return False
+        messages = fast_checker.check(self.get_code(), self.test_path)
+        if not messages:
+            return False
+        recoder.add_stat('fast_check_failures')
+        self.error_message = '\n'.join(messages)
+        logging.error(self.error_message)
+        return True
+
+    async def find_syntax_error(self):
+        # obvious mistakes are found in-process, pylint only has to look at files that look right
+        if self.find_fast_error():
+            return True
         root_dir = self.func.file.root_dir
-        user_python_path = os.getenv('USER_PYTHON_PATH')
-        command = f'PYTHONPATH={root_dir} {user_python_path} -m pylint --errors-only --init-hook="import sys; sys.path.append(\'{root_dir}\')" {self.test_path}'
+        args = [os.getenv('USER_PYTHON_PATH'), '-m', 'pylint', '--errors-only',
+                f"--init-hook=import sys; sys.path.append('{root_dir}')", self.test_path]
+        env = dict(os.environ, PYTHONPATH=root_dir)
 
-        result = subprocess.run(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        async with pytest_pool.get_semaphore():
+            result = await run_process(args, env=env)
         if result.returncode == 0:
             return False
         else:
@@ -285,20 +328,45 @@ class Testcase:
             self.error_message = result.stdout
             return True
 
-    def find_assert_error(self):
+    @staticmethod
+    def create_report_path():
+        # every run gets its own report, concurrent checks must not read each other's results
+        fd, report_path = tempfile.mkstemp(prefix='pytest_report_', suffix='.json')
+        os.close(fd)
+        return report_path
+
+    @staticmethod
+    def read_report(report_path):
         try:
-            result = subprocess.run([os.getenv('USER_PYTHON_PATH'), '-m', 'pytest', self.test_path, '--json-report', '--json-report-file=pytest_report.json'],
-                                    capture_output=True, text=True, timeout=10)
-        except subprocess.TimeoutExpired:
+            with open(report_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # pytest died before the plugin wrote its report
+            return None
+        finally:
+            try:
+                os.remove(report_path)
+            except FileNotFoundError:
+                pass
+
+    async def find_assert_error(self, test_timeout=None, record_errors=True):
+        # runs repeating one whose failures were already counted pass record_errors=False
+        report_path = self.create_report_path()
+        result = await pytest_pool.run(self.test_path, report_path, 10, test_timeout)
+        pytest_report = self.read_report(report_path)
+        self.failed_tests = self.get_failed_tests(pytest_report)
+        self.hanging_tests = None
+        if result.hanging_tests is not None:
+            self.hanging_tests = {self.parse_nodeid(nodeid) for nodeid in result.hanging_tests}
+        if result.timed_out:
             self.error_message = "time exceeded"
-            recoder.score.add_assertion_error_type('TimeoutExpired')
+            if record_errors:
+                recoder.score.add_assertion_error_type('TimeoutExpired')
             return True
         if result.returncode == 0:
             return False
         else:
-            with open('pytest_report.json', 'r') as f:
-                pytest_report = json.load(f)
-            tests = pytest_report['tests']
+            tests = pytest_report['tests'] if pytest_report is not None and record_errors else []
             for test in tests:
                 try:
                     traceback = test['call']['traceback']
@@ -311,12 +379,38 @@ class Testcase:
             self.error_message = result.stdout
             return True
 
+    @staticmethod
+    def get_failed_tests(pytest_report):
+        # (class name or None, function name) of every failing test, None when the report cannot tell
+        if pytest_report is None:
+            return None
+        if any(collector['outcome'] == 'failed' for collector in pytest_report.get('collectors', [])):
+            return None
+        failed_tests = set()
+        for test in pytest_report.get('tests', []):
+            if test['outcome'] not in ('failed', 'error'):
+                continue
+            failed_tests.add(Testcase.parse_nodeid(test['nodeid']))
+        if None in failed_tests:
+            return None
+        return failed_tests
+
+    @staticmethod
+    def parse_nodeid(nodeid):
+        names = nodeid.split('::')[1:]
+        if len(names) == 0 or len(names) > 2:
+            return None
+        names[-1] = names[-1].split('[')[0]
+        if len(names) == 1:
+            return None, names[0]
+        return names[0], names[1]
+
     async def syntax_check(self, check_rate=False):
-        if self.find_syntax_error():
+        if await self.find_syntax_error():
             if check_rate:
                 recoder.score.add_syntax_error()
             await self.repair_syntax_error()
-            if self.find_syntax_error():
+            if await self.find_syntax_error():
                 return False
             if check_rate:
                 recoder.score.add_syntax_fix_success()
@@ -329,18 +423,18 @@ class Testcase:
         # TODO: add model auto repair function
         if not await self.syntax_check(check_rate=True):
             return False
-        if self.find_assert_error():
+        if await self.find_assert_error():
             recoder.score.add_assertion_error()
             await self.repair_assert_error()
             if not await self.syntax_check():
                 return False
-            if self.find_assert_error():
+            if await self.find_assert_error():
                 found_message = await self.test_manager.auto_find_message(self.get_assert_error_message())
                 await self.repair_assert_error(found_message)
                 if not await self.syntax_check():
                     return False
-                if self.find_assert_error():
-                    return self.decline_error_code()
+                if await self.find_assert_error():
+                    return await self.decline_error_code()
                 else:
                     recoder.score.add_assertion_fix_success()
                     return True
@@ -351,11 +445,80 @@ class Testcase:
             recoder.score.add_assertion_pass()
             return True
 
-    def decline_error_code(self):
-        if self.error_message == "time exceeded":
-            return self.declineTimeoutTestcase()
-        else:
-            return self.declineTestCase()
+    async def decline_error_code(self):
+        timed_out = self.error_message == "time exceeded"
+        if config.decline_mode == 'prune':
+            failed_tests = self.failed_tests
+            if timed_out:
+                # without a runner that times single tests, another run would only time out again
+                if not pytest_pool.can_time_tests():
+                    return await self.declineTimeoutTestcase()
+                failed_tests = await self.find_hanging_tests()
+            passed = await self.prune_failed_tests(failed_tests)
+            if passed is not None:
+                return passed
+        if timed_out:
+            return await self.declineTimeoutTestcase()
+        return await self.declineTestCase()
+
+    async def find_hanging_tests(self):
+        # one more run with a timeout per test, a hanging test fails alone and the rest of the file still runs
+        await self.find_assert_error(config.test_timeout, record_errors=False)
+        if self.hanging_tests is None or None in self.hanging_tests:
+            return None
+        return self.hanging_tests | (self.failed_tests or set())
+
+    @staticmethod
+    def get_node_lines(node):
+        start = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+        return range(start - 1, node.end_lineno)
+
+    def find_failed_test_lines(self, tree, failed_tests):
+        # line indexes of the failing tests and whether any test is left, None when a test cannot be located
+        removed = set()
+        kept = 0
+        tests = {(None, node.name): node for node in tree.body
+                 if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))}
+        for node in tree.body:
+            if not isinstance(node, ast.ClassDef):
+                continue
+            methods = [item for item in node.body if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef))]
+            failed = [method for method in methods if (node.name, method.name) in failed_tests]
+            tests.update({(node.name, method.name): method for method in methods})
+            if failed and len(failed) == len(node.body):
+                # an empty class body would not parse, drop the whole class
+                removed.update(self.get_node_lines(node))
+            else:
+                for method in failed:
+                    removed.update(self.get_node_lines(method))
+        for key, node in tests.items():
+            if key in failed_tests:
+                removed.update(self.get_node_lines(node))
+            elif node.name.startswith('test'):
+                kept += 1
+        if not failed_tests.issubset(tests.keys()):
+            return None, 0
+        return removed, kept
+
+    async def prune_failed_tests(self, failed_tests):
+        # a run already told which tests fail, drop them and verify once instead of bisecting
+        if not failed_tests:
+            return None
+        code = self.get_code()
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            return None
+        removed, kept = self.find_failed_test_lines(tree, failed_tests)
+        if removed is None or kept == 0:
+            return None
+        lines = code.splitlines()
+        self.set_code('\n'.join(line for index, line in enumerate(lines) if index not in removed))
+        if await self.find_syntax_error() or await self.find_assert_error(record_errors=False):
+            self.set_code(code)
+            return None
+        recoder.add_stat('pruned_tests', len(failed_tests))
+        return True
 
     @staticmethod
     def find_asserts_in_file(file_content):
@@ -369,7 +532,7 @@ class Testcase:
                 asserts.append(node.lineno)
         return asserts
 
-    def declineTestCase(self):
+    async def declineTestCase(self):
         code = self.get_code()
         lines = code.splitlines()
         asserts = self.find_asserts_in_file(code)
@@ -381,10 +544,10 @@ class Testcase:
             declined_code = '\n'.join(lines[0:asserts[mid] - 1])
             success = True
             self.set_code(declined_code)
-            if self.find_syntax_error():
+            if await self.find_syntax_error():
                 success = False
             else:
-                if self.find_assert_error():
+                if await self.find_assert_error():
                     success = False
             if not success:
                 high = mid - 1
@@ -399,7 +562,7 @@ class Testcase:
             pass_the_assert = False
         return pass_the_assert
 
-    def declineTimeoutTestcase(self):
+    async def declineTimeoutTestcase(self):
         code = self.get_code()
         lines = code.splitlines()
         asserts = self.find_asserts_in_file(code)
@@ -410,10 +573,10 @@ class Testcase:
             declined_code = '\n'.join(lines[0:asserts[reached_line] - 1])
             success = True
             self.set_code(declined_code)
-            if self.find_syntax_error():
+            if await self.find_syntax_error():
                 success = False
             else:
-                if self.find_assert_error():
+                if await self.find_assert_error():
                     success = False
             if not success:
                 break
@@ -11,12 +11,6 @@ def get_code(code: str):
     return tmp
 
 
-def get_origin_code(file_path, start, end):
-    with open(file_path, 'r', encoding='utf-8') as file:
-        lines = file.read().splitlines()
-    return '\n'.join(lines[start - 1: end])
-
-
 def get_class_attr(node, source_code) -> str:
     class_attributes_code = []
     for stmt in node.body:
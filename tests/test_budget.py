@@ -0,0 +1,63 @@
+import asyncio
+
+from test4dt.budget import RequestCost, RoundBudget, request_cost, track_request
+
+
+def create_cost(requests, tokens):
+    cost = RequestCost()
+    cost.requests = requests
+    cost.tokens = tokens
+    return cost
+
+
+def test_estimate_is_the_mean_of_generations_that_asked():
+    budget = RoundBudget(max_requests=100)
+    assert budget.get_estimate() == (3, 6000)
+    budget.pay(budget.reserve(), create_cost(2, 1000))
+    budget.pay(budget.reserve(), create_cost(4, 3000))
+    # a generation that asked nothing leaves the estimate alone
+    budget.pay(budget.reserve(), create_cost(0, 0))
+    assert budget.get_estimate() == (3, 2000)
+    assert (budget.spent.requests, budget.spent.tokens) == (6, 4000)
+    assert (budget.reserved.requests, budget.reserved.tokens) == (0, 0)
+
+
+def test_reservations_count_against_the_limit():
+    budget = RoundBudget(max_requests=7)
+    assert budget.can_start()
+    reservation = budget.reserve()
+    assert budget.can_start()
+    budget.reserve()
+    # 3 + 3 reserved, another 3 would go over 7
+    assert not budget.can_start()
+    budget.pay(reservation, create_cost(1, 100))
+    assert budget.get_estimate() == (1, 100)
+    assert budget.can_start()
+
+
+def test_token_limit_and_no_limit():
+    budget = RoundBudget(max_tokens=5000)
+    assert budget.is_limited()
+    assert not budget.can_start()
+    budget = RoundBudget()
+    assert not budget.is_limited()
+    budget.pay(budget.reserve(), create_cost(10 ** 6, 10 ** 9))
+    assert budget.can_start()
+
+
+def test_requests_are_tracked_per_task():
+    async def generate(requests):
+        cost = RequestCost()
+        request_cost.set(cost)
+        for _ in range(requests):
+            await asyncio.sleep(0)
+            track_request(10)
+        return cost.requests, cost.tokens
+
+    async def main():
+        return await asyncio.gather(generate(1), generate(3))
+
+    assert asyncio.run(main()) == [(1, 10), (3, 30)]
+    # outside of a generation nothing is tracked
+    track_request(10)
+    assert request_cost.get() is None
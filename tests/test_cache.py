@@ -0,0 +1,63 @@
+import sqlite3
+
+from test4dt.cache import ResponseCache
+
+
+def test_put_and_get(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'responses.sqlite'), 1024)
+    key = ResponseCache.get_key('model', 0.0, [{'role': 'user', 'content': 'hello'}])
+    assert cache.get(key) is None
+    cache.put(key, 'answer')
+    assert cache.get(key) == 'answer'
+
+
+def test_key_depends_on_model_temperature_and_messages():
+    messages = [{'role': 'user', 'content': 'hello'}]
+    key = ResponseCache.get_key('model', 0.0, messages)
+    assert key == ResponseCache.get_key('model', 0.0, [{'content': 'hello', 'role': 'user'}])
+    assert key != ResponseCache.get_key('other', 0.0, messages)
+    assert key != ResponseCache.get_key('model', 0.5, messages)
+    assert key != ResponseCache.get_key('model', 0.0, [{'role': 'user', 'content': 'hi'}])
+
+
+def test_evicts_least_recently_used(tmp_path, monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr('test4dt.cache.time.time', lambda: now[0])
+    cache = ResponseCache(str(tmp_path / 'responses.sqlite'), 10)
+    for key in ('a', 'b'):
+        now[0] += 1
+        cache.put(key, 'xxxx')
+    now[0] += 1
+    # reading a makes b the least recently used
+    assert cache.get('a') == 'xxxx'
+    now[0] += 1
+    cache.put('c', 'xxxx')
+    assert cache.get('b') is None
+    assert cache.get('a') == 'xxxx'
+    assert cache.get('c') == 'xxxx'
+    assert cache.size == 8
+
+
+def test_response_larger_than_the_cache_is_not_stored(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'responses.sqlite'), 4)
+    cache.put('key', 'too long')
+    assert cache.get('key') is None
+    assert cache.size == 0
+
+
+def test_commits_in_batches(tmp_path):
+    path = str(tmp_path / 'responses.sqlite')
+    cache = ResponseCache(path, 1024, commit_interval=2)
+
+    def stored():
+        with sqlite3.connect(path) as connection:
+            return connection.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    cache.put('a', 'x')
+    assert stored() == 0
+    cache.put('b', 'x')
+    assert stored() == 2
+    cache.put('c', 'x')
+    cache.close()
+    assert stored() == 3
+    assert ResponseCache(path, 1024).get('c') == 'x'
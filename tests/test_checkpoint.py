@@ -0,0 +1,143 @@
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+from test4dt.checkpoint import Checkpoint
+from test4dt.coverage_message import CoverageMessage
+from test4dt.recorder import recoder
+
+
+class TestManager:
+    __test__ = False
+
+    def __init__(self):
+        self.testcases = []
+        self.count = 0
+        self.coverage = None
+
+    def restore_testcases(self, test_paths):
+        self.testcases = [SimpleNamespace(test_path=test_path) for test_path in test_paths if os.path.exists(test_path)]
+
+
+class Function:
+    def __init__(self, unique_name):
+        self.unique_name = unique_name
+        self.summary = None
+        self.vector = None
+        self.test_manager = TestManager()
+
+    def to_knowledge(self):
+        return {'summary': self.summary, 'vector': self.vector}
+
+    def load_knowledge(self, value):
+        self.summary = value['summary']
+        self.vector = value['vector']
+
+
+class Class:
+    def __init__(self, full_name):
+        self.full_name = full_name
+        self.how_to_use = None
+        self.vector = None
+
+    def to_knowledge(self):
+        return {'how_to_use': self.how_to_use, 'vector': self.vector}
+
+    def load_knowledge(self, value):
+        self.how_to_use = value['how_to_use']
+        self.vector = value['vector']
+
+
+def create_project(root_dir, names):
+    functions = [Function(name) for name in names]
+    classes = [Class('mod.A')]
+    return SimpleNamespace(root_dir=str(root_dir), dir_type='Test4DT_tests', round=0, completed=set(),
+                           coverage_summary=None, readme_analyses={}, get_functions=lambda: functions,
+                           get_classes=lambda: classes)
+
+
+def write_test(root_dir, name):
+    test_dir = os.path.join(str(root_dir), 'Test4DT_tests')
+    os.makedirs(test_dir, exist_ok=True)
+    test_path = os.path.join(test_dir, name)
+    with open(test_path, 'w') as f:
+        f.write('def test():\n    pass\n')
+    return test_path
+
+
+def test_round_trip(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / 'Test4DT_tests' / '.test4dt' / 'checkpoint.json'))
+    # a property getter and setter share their module name, the line tells them apart
+    project = create_project(tmp_path, ['mod.A.x:3', 'mod.A.x:7'])
+    getter, setter = project.get_functions()
+    getter.summary = 'getter'
+    getter.vector = [1.0, 2.0]
+    setter.summary = 'setter'
+    setter.test_manager.count = 2
+    setter.test_manager.testcases = [SimpleNamespace(test_path=write_test(tmp_path, 'test_x0.py'))]
+    setter.test_manager.coverage = CoverageMessage([4], {'missing_lines': 1, 'covered_lines': 3})
+    project.get_classes()[0].how_to_use = 'A()'
+    project.round = 1
+    project.completed = {'mod.A.x:3'}
+    project.readme_analyses = {'hash': 'analysis'}
+    checkpoint.save(project)
+
+    restored = create_project(tmp_path, ['mod.A.x:3', 'mod.A.x:7'])
+    state = checkpoint.load()
+    checkpoint.restore_readmes(restored, state)
+    checkpoint.restore(restored, state)
+    getter, setter = restored.get_functions()
+    assert restored.round == 1
+    assert restored.completed == {'mod.A.x:3'}
+    assert restored.readme_analyses == {'hash': 'analysis'}
+    assert getter.summary == 'getter'
+    # vectors are left out of checkpoints
+    assert getter.vector is None
+    assert setter.summary == 'setter'
+    assert setter.test_manager.count == 2
+    assert [testcase.test_path for testcase in setter.test_manager.testcases] == [write_test(tmp_path, 'test_x0.py')]
+    assert setter.test_manager.coverage.missing_lines == [4]
+    assert restored.get_classes()[0].how_to_use == 'A()'
+
+
+def test_restore_removes_tests_written_after_the_checkpoint(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / 'Test4DT_tests' / '.test4dt' / 'checkpoint.json'))
+    project = create_project(tmp_path, ['mod.f:1'])
+    kept = write_test(tmp_path, 'test_f0.py')
+    project.get_functions()[0].test_manager.testcases = [SimpleNamespace(test_path=kept)]
+    checkpoint.save(project)
+    partial = write_test(tmp_path, 'test_f1.py')
+    conftest = write_test(tmp_path, 'conftest.py')
+
+    restored = create_project(tmp_path, ['mod.f:1'])
+    checkpoint.restore(restored, checkpoint.load())
+    assert os.path.exists(kept)
+    assert not os.path.exists(partial)
+    assert os.path.exists(conftest)
+
+
+def test_running_timer_is_saved_as_a_duration(tmp_path, monkeypatch):
+    monkeypatch.setattr(recoder, 'times', {})
+    monkeypatch.setattr(recoder, 'started', {})
+    checkpoint = Checkpoint(str(tmp_path / 'Test4DT_tests' / '.test4dt' / 'checkpoint.json'))
+    recoder.start_count_time('collect_message')
+    time.sleep(0.01)
+    asyncio.run(checkpoint.asave(create_project(tmp_path, [])))
+    saved = checkpoint.load()['recoder']['times']['collect_message']
+    assert 0 < saved < 60
+
+    # the resumed run closes its own timer on top of the restored duration
+    recoder.times = {}
+    recoder.started = {}
+    recoder.start_count_time('collect_message')
+    checkpoint.restore(create_project(tmp_path, []), checkpoint.load())
+    recoder.end_count_time('collect_message')
+    assert saved <= recoder.times['collect_message'] < 60
+
+
+def test_an_earlier_save_does_not_replace_a_later_one(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / 'checkpoint.json'))
+    checkpoint.write({'round': 2}, 2)
+    checkpoint.write({'round': 1}, 1)
+    assert checkpoint.load() == {'round': 2}
@@ -0,0 +1,66 @@
+import json
+import os
+
+from test4dt.config import config
+from test4dt.coverage_message import MyCoverage
+
+
+class FakeCoverage(MyCoverage):
+    """Runs no process, every batch writes an empty data file named after its test files."""
+
+    def __init__(self, path):
+        super().__init__(str(path), 'Test4DT_tests', 'pkg')
+        self.batches = []
+
+    def run_tests(self, test_files, durations):
+        self.batches.append(sorted(test_files))
+        data_file = f'batch-{len(self.batches)}.coverage'
+        open(os.path.join(self.data_dir, data_file), 'w').close()
+        return data_file
+
+    def run_coverage(self, args):
+        if args[0] == 'json':
+            with open(os.path.join(self.path, self.test_path, 'coverage.json'), 'w') as f:
+                json.dump({'totals': {}}, f)
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+def test_only_stale_batches_run_again(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'coverage_contexts', False)
+    monkeypatch.setattr(config, 'prune_redundant_tests', False)
+    write(str(tmp_path / 'pkg' / 'mod.py'), 'x = 1\n')
+    test_a = os.path.join('Test4DT_tests', 'test_a.py')
+    test_b = os.path.join('Test4DT_tests', 'test_b.py')
+    test_c = os.path.join('Test4DT_tests', 'test_c.py')
+    for test_file in (test_a, test_b):
+        write(str(tmp_path / test_file), 'def test():\n    pass\n')
+    my_coverage = FakeCoverage(tmp_path)
+    my_coverage.get_coverage()
+    write(str(tmp_path / test_c), 'def test():\n    pass\n')
+    my_coverage.get_coverage()
+    assert my_coverage.batches == [[test_a, test_b], [test_c]]
+
+    # nothing changed, nothing runs
+    my_coverage.get_coverage()
+    assert len(my_coverage.batches) == 2
+
+    # a changed test file takes the other tests of its data file along, test_c keeps its coverage
+    write(str(tmp_path / test_a), 'def test():\n    assert True\n')
+    my_coverage.get_coverage()
+    assert my_coverage.batches[2:] == [[test_a, test_b]]
+    assert not os.path.exists(os.path.join(my_coverage.data_dir, 'batch-1.coverage'))
+
+    # a missing data file counts as stale
+    os.remove(os.path.join(my_coverage.data_dir, 'batch-2.coverage'))
+    my_coverage.get_coverage()
+    assert my_coverage.batches[3:] == [[test_c]]
+
+    # changed sources invalidate every data file
+    write(str(tmp_path / 'pkg' / 'mod.py'), 'x = 2\n')
+    my_coverage.get_coverage()
+    assert my_coverage.batches[4:] == [[test_a, test_b, test_c]]
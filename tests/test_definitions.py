@@ -0,0 +1,150 @@
+import glob
+import os
+
+from test4dt.pycg.machinery.definitions import DefinitionManager
+from test4dt.pycg.pycg import CallGraphGenerator
+
+
+def old_complete_definitions(self):
+    # the fixpoint complete_definitions computed before dirty definitions were tracked
+    def update_pointsto_args(pointsto_args, arg, name):
+        changed_something = False
+        if arg == pointsto_args:
+            return False
+        for pointsto_arg in pointsto_args:
+            if not self.defs.get(pointsto_arg, None):
+                continue
+            if pointsto_arg == name:
+                continue
+            pointsto_arg_def = self.defs[pointsto_arg].get_name_pointer()
+            if pointsto_arg in arg:
+                arg.remove(pointsto_arg)
+            for item in arg:
+                if not item in pointsto_arg_def.get():
+                    if self.defs.get(item, None) != None:
+                        changed_something = True
+                if not self.defs.get(item, None):
+                    continue
+                pointsto_arg_def.add(item)
+        return changed_something
+
+    for i in range(len(self.defs)):
+        changed_something = False
+        for ns, current_def in self.defs.items():
+            current_name_pointer = current_def.get_name_pointer()
+            for name in current_name_pointer.get().copy():
+                if not self.defs.get(name, None):
+                    continue
+                if name == ns:
+                    continue
+                pointsto_name_pointer = self.defs[name].get_name_pointer()
+                for arg_name, arg in current_name_pointer.get_args().items():
+                    pos = current_name_pointer.get_pos_of_name(arg_name)
+                    if not pos is None:
+                        pointsto_args = pointsto_name_pointer.get_pos_arg(pos)
+                        if not pointsto_args:
+                            pointsto_name_pointer.add_pos_arg(pos, None, arg)
+                            continue
+                    else:
+                        pointsto_args = pointsto_name_pointer.get_arg(arg_name)
+                        if not pointsto_args:
+                            pointsto_name_pointer.add_arg(arg_name, arg)
+                            continue
+                    changed_something = changed_something or update_pointsto_args(pointsto_args, arg,
+                                                                                   current_def.get_ns())
+        if not changed_something:
+            break
+
+
+FIXTURE = {
+    '__init__.py': 'from .calls import run\n',
+    'calls.py': '''from .shapes import Circle, Square, make
+
+
+def apply(func, value):
+    return func(value)
+
+
+def twice(func, value):
+    return apply(func, apply(func, value))
+
+
+def compose(first, second):
+    return lambda value: second(first(value))
+
+
+def area(shape):
+    return shape.area()
+
+
+def even(n):
+    return n == 0 or odd(n - 1)
+
+
+def odd(n):
+    return n != 0 and even(n - 1)
+
+
+def run(kind=None, *args, **kwargs):
+    shape = make(kind or Circle)
+    handler = compose(area, str)
+    twice(handler, shape)
+    apply(lambda item: item.scale(2), Square())
+    apply(even, 3)
+    callbacks = {'area': area, 'odd': odd}
+    return callbacks[kind](shape, *args, **kwargs)
+''',
+    'shapes.py': '''class Shape:
+    def area(self):
+        return 0
+
+    def scale(self, factor):
+        return self.resize(factor)
+
+    def resize(self, factor):
+        return self
+
+
+class Circle(Shape):
+    def area(self):
+        return super().area() + 1
+
+
+class Square(Shape):
+    def resize(self, factor):
+        return Circle()
+
+
+def make(cls, *args):
+    return cls(*args)
+''',
+}
+
+
+def get_state(root_dir):
+    files = sorted(glob.glob(os.path.join(root_dir, 'pkg', '**', '*.py'), recursive=True))
+    generator = CallGraphGenerator(files, root_dir, -1, 'call-graph')
+    generator.analyze()
+    defs = {}
+    for ns, definition in generator.def_manager.get_defs().items():
+        pointer = definition.get_name_pointer()
+        defs[ns] = (sorted(pointer.get()), sorted(map(str, definition.get_lit_pointer().get())),
+                    sorted((str(name), sorted(map(str, arg))) for name, arg in pointer.get_args().items()))
+    call_graph = {source: sorted((dest['dest'], dest['line_no']) for dest in dests)
+                  for source, dests in generator.output().items()}
+    return call_graph, defs
+
+
+def test_worklist_matches_the_old_fixpoint(tmp_path, monkeypatch):
+    for name, source in FIXTURE.items():
+        path = tmp_path / 'pkg' / name
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(source)
+    new_state = get_state(str(tmp_path))
+    monkeypatch.setattr(DefinitionManager, 'complete_definitions', old_complete_definitions)
+    old_state = get_state(str(tmp_path))
+    assert new_state == old_state
+    call_graph, _ = new_state
+    # the function passed through apply and twice is resolved
+    assert [dest for dest, _ in call_graph['pkg.calls.apply']] == \
+        ['pkg.calls.compose.<lambda1>', 'pkg.calls.even', 'pkg.calls.run.<lambda1>']
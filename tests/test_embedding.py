@@ -0,0 +1,42 @@
+import numpy as np
+
+from test4dt.embedding import VectorIndex
+
+
+class Message:
+    def __init__(self, vector):
+        self.vector = vector
+
+
+def brute_force(messages, query, k):
+    distances = [float(np.sum((np.asarray(message.vector) - np.asarray(query)) ** 2)) for message in messages]
+    order = sorted(range(len(messages)), key=lambda index: distances[index])
+    return [messages[index] for index in order[:k]]
+
+
+def test_query_matches_brute_force():
+    generator = np.random.default_rng(0)
+    messages = [Message(generator.normal(size=16).tolist()) for _ in range(200)]
+    index = VectorIndex(messages)
+    for _ in range(20):
+        query = generator.normal(size=16).tolist()
+        for k in (1, 3, 10, 500):
+            assert index.query(query, k) == brute_force(messages, query, k)
+
+
+def test_query_among_candidates():
+    generator = np.random.default_rng(1)
+    messages = [Message(generator.normal(size=8).tolist()) for _ in range(50)]
+    index = VectorIndex(messages)
+    candidates = messages[10:30]
+    query = generator.normal(size=8).tolist()
+    assert index.query(query, 3, candidates) == brute_force(candidates, query, 3)
+
+
+def test_messages_without_vector_are_left_out():
+    with_vector = Message([1.0, 0.0])
+    messages = [Message(None), with_vector]
+    index = VectorIndex(messages)
+    assert index.query([0.0, 0.0], 3) == [with_vector]
+    assert index.query([0.0, 0.0], 3, [messages[0]]) == []
+    assert VectorIndex([]).query([0.0, 0.0], 3) == []
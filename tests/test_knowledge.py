@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+
+from test4dt.knowledge import KnowledgeStore, get_hash
+from test4dt.recorder import recoder
+
+
+class Entity:
+    def __init__(self, key, summary=None):
+        self.key = key
+        self.summary = summary
+
+    def get_knowledge_key(self):
+        return self.key
+
+    def to_knowledge(self):
+        return {'summary': self.summary}
+
+    def load_knowledge(self, value):
+        self.summary = value['summary']
+
+
+def create_project(functions, classes=()):
+    return SimpleNamespace(get_functions=lambda: list(functions), get_classes=lambda: list(classes))
+
+
+def test_get_hash_separates_parts():
+    assert get_hash('ab', 'c') != get_hash('a', 'bc')
+    assert get_hash('a', 'b') == get_hash('a', 'b')
+
+
+def test_unchanged_keys_are_reused(tmp_path):
+    path = str(tmp_path / 'knowledge.sqlite')
+    KnowledgeStore(path).save(create_project([Entity('f', 'f summary'), Entity('g', 'g summary')],
+                                             [Entity('c', 'c summary')]))
+
+    functions = [Entity('f'), Entity('g2')]
+    classes = [Entity('c')]
+    KnowledgeStore(path).load(create_project(functions, classes))
+    assert functions[0].summary == 'f summary'
+    assert functions[1].summary is None
+    assert classes[0].summary == 'c summary'
+    assert recoder.stats['knowledge_reused_functions'] == 1
+    assert recoder.stats['knowledge_reused_classes'] == 1
+
+
+def test_save_drops_entries_of_changed_code(tmp_path):
+    path = str(tmp_path / 'knowledge.sqlite')
+    store = KnowledgeStore(path)
+    store.save(create_project([Entity('f', 'old')]))
+    store.put('readme', 'r', 'analysis')
+    store.save(create_project([Entity('f2', 'new')]))
+    assert store.get('function', 'f') is None
+    assert store.get('function', 'f2') == {'summary': 'new'}
+    # README analyses are not tied to functions and classes
+    assert store.get('readme', 'r') == 'analysis'
@@ -0,0 +1,80 @@
+import ast
+from types import SimpleNamespace
+
+from test4dt.precheck import FastChecker, get_module_names
+
+
+def create_checker(sources):
+    file_messages = []
+    for mod_name, source in sources.items():
+        top_level_names, dynamic_names = get_module_names(ast.parse(source))
+        file_messages.append(SimpleNamespace(mod_name=mod_name, top_level_names=top_level_names,
+                                             dynamic_names=dynamic_names))
+    return FastChecker(file_messages)
+
+
+CHECKER_SOURCES = {
+    'pkg': '',
+    'pkg.shapes': 'import math\n\nclass Circle:\n    pass\n\nif True:\n    AREA = 1\n',
+    'pkg.lazy': 'def __getattr__(name):\n    return name\n',
+}
+
+
+def get_codes(code):
+    messages = create_checker(CHECKER_SOURCES).check(code, 'test_x.py')
+    return [message.split(': ')[1] for message in messages]
+
+
+def test_valid_test_passes():
+    code = '''
+import pytest
+from pkg.shapes import Circle, AREA, math
+from pkg.lazy import anything
+import pkg.shapes
+
+
+class TestCircle:
+    def test_circle(self):
+        assert isinstance(Circle(), Circle)
+        assert __class__.__qualname__ == 'TestCircle'
+        assert [item for item in range(AREA)] == [0]
+
+    name = __qualname__ + __module__
+
+
+def test_match(value=1):
+    match value:
+        case {'a': 1, **rest}:
+            return rest
+        case [first, *others]:
+            return first, others
+        case other:
+            try:
+                return other
+            except ValueError as error:
+                return error
+'''
+    assert get_codes(code) == []
+
+
+def test_syntax_error():
+    assert get_codes('def test(:\n    pass\n') == ['E0001']
+
+
+def test_missing_project_module_and_name():
+    code = 'import pkg.circles\nfrom pkg.shapes import Square\nfrom pkg.missing import x\n'
+    assert get_codes(code) == ['E0401', 'E0611', 'E0401']
+
+
+def test_other_modules_are_left_to_pylint():
+    assert get_codes('import numpy\nfrom os import not_there\n') == []
+
+
+def test_undefined_name():
+    assert get_codes('def test():\n    assert undefined_name == 1\n') == ['E0602']
+
+
+def test_dynamic_code_is_left_to_pylint():
+    assert get_codes('from pkg.shapes import *\n\ndef test():\n    assert Circle\n') == []
+    assert get_codes('def test():\n    exec("x = 1")\n    assert x == 1\n') == []
+    assert get_codes('def test():\n    assert __unknown__\n') == []
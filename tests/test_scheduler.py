@@ -0,0 +1,78 @@
+import asyncio
+from types import SimpleNamespace
+
+from test4dt.scheduler import CallGraphScheduler
+
+
+class Function:
+    # the scheduler keys its tables by function, like FunctionMessage it hashes by identity
+    def __init__(self, name):
+        self.name = name
+        self.uses = []
+        self.used = []
+
+
+def create_functions(names, calls):
+    functions = {name: Function(name) for name in names}
+    for source, dest in calls:
+        use = SimpleNamespace(source=functions[source], dest=functions[dest])
+        functions[source].uses.append(use)
+        functions[dest].used.append(use)
+    return [functions[name] for name in names]
+
+
+def get_components(scheduler):
+    return [[function.name for function in component] for component in scheduler.components]
+
+
+def test_components_come_callees_first():
+    # a -> b <-> c -> d, e alone
+    functions = create_functions('abcde', [('a', 'b'), ('b', 'c'), ('c', 'b'), ('c', 'd')])
+    scheduler = CallGraphScheduler(functions)
+    components = get_components(scheduler)
+    assert sorted(components) == [['a'], ['b', 'c'], ['d'], ['e']]
+    position = {name: index for index, component in enumerate(components) for name in component}
+    assert position['d'] < position['b'] < position['a']
+    assert scheduler.get_critical_path() == 3
+    assert scheduler.get_stage_sizes() == [2, 1, 1]
+
+
+def test_run_finishes_callees_before_callers():
+    functions = create_functions('abcd', [('a', 'b'), ('a', 'c'), ('b', 'd'), ('c', 'd'), ('d', 'd')])
+    scheduler = CallGraphScheduler(functions)
+    done = []
+
+    async def worker(function):
+        await asyncio.sleep(0)
+        for use in function.uses:
+            assert use.dest is function or use.dest.name in done
+        done.append(function.name)
+
+    asyncio.run(scheduler.run(worker, 2))
+    assert sorted(done) == ['a', 'b', 'c', 'd']
+    assert done[0] == 'd' and done[-1] == 'a'
+
+
+def test_deep_chain_does_not_recurse():
+    names = [f'f{index}' for index in range(5000)]
+    functions = create_functions(names, list(zip(names, names[1:])))
+    scheduler = CallGraphScheduler(functions)
+    assert len(scheduler.components) == 5000
+    assert scheduler.get_critical_path() == 5000
+
+
+def test_reach_hashes_change_with_any_reached_function():
+    functions = create_functions('abcd', [('a', 'b'), ('b', 'c'), ('c', 'b'), ('c', 'd')])
+
+    def get_hashes():
+        scheduler = CallGraphScheduler(functions)
+        downward, upward = scheduler.get_reach_hashes(lambda function: function.name, lambda parts: '|'.join(parts))
+        return {function.name: (downward[scheduler.component_of[function]], upward[scheduler.component_of[function]])
+                for function in functions}
+
+    before = get_hashes()
+    functions[3].name = 'd2'
+    after = get_hashes()
+    # d is two calls away from a
+    assert before['a'][0] != after['a'][0]
+    assert before['a'][1] == after['a'][1]
@@ -0,0 +1,126 @@
+import ast
+import asyncio
+import os
+from types import SimpleNamespace
+
+from test4dt.message import ProjectMessage
+from test4dt import testcase
+
+
+def create_function(root_dir):
+    async def judge_params():
+        pass
+
+    file = SimpleNamespace(root_dir=str(root_dir), file_path=os.path.join(str(root_dir), 'pkg', 'mod.py'),
+                           mod_name='pkg.mod')
+    function = SimpleNamespace(file=file, func_name='func', judge_params=judge_params)
+    function.test_manager = testcase.TestManager(function, 'Test4DT_tests')
+    function.test_manager.init_test_single_path()
+    return function
+
+
+def test_generate_after_pruning_a_middle_test(tmp_path, monkeypatch):
+    async def generate(self):
+        return f'def test_{self.count}():\n    pass\n'
+
+    async def assert_check(self):
+        return True
+
+    monkeypatch.setattr(testcase.TestManager, 'generate_test_case_normal', generate)
+    monkeypatch.setattr(testcase.TestManager, 'generate_test_case_easy', generate)
+    monkeypatch.setattr(testcase.Testcase, 'assert_check', assert_check)
+    function = create_function(tmp_path)
+    test_manager = function.test_manager
+    for _ in range(3):
+        asyncio.run(test_manager.generate_test_case())
+    first, middle, last = test_manager.testcases
+
+    redundant = [os.path.relpath(middle.test_path, str(tmp_path))]
+    project = SimpleNamespace(root_dir=str(tmp_path), get_functions=lambda: [function],
+                              coverage=SimpleNamespace(find_redundant_tests=lambda: redundant))
+    ProjectMessage.prune_redundant_tests(project)
+    assert test_manager.testcases == [first, last]
+    assert not os.path.exists(middle.test_path)
+
+    last_code = last.get_code()
+    asyncio.run(test_manager.generate_test_case())
+    new = test_manager.testcases[-1]
+    assert new.test_path not in (first.test_path, last.test_path)
+    assert last.get_code() == last_code
+    assert new.get_code() == 'def test_3():\n    pass\n'
+
+
+PRUNE_CODE = '''import pytest
+
+
+def test_ok():
+    assert True
+
+
+@pytest.mark.parametrize('value', [1])
+def test_bad(value):
+    assert value == 2
+
+
+class TestGroup:
+    def test_fine(self):
+        assert True
+
+    def test_broken(self):
+        assert False
+
+
+class TestAllBroken:
+    def test_broken(self):
+        assert False
+'''
+
+
+def create_testcase(tmp_path, code):
+    return testcase.Testcase(None, None, str(tmp_path / 'test_prune.py'), code)
+
+
+def test_find_failed_test_lines(tmp_path):
+    case = create_testcase(tmp_path, PRUNE_CODE)
+    failed = {(None, 'test_bad'), ('TestGroup', 'test_broken'), ('TestAllBroken', 'test_broken')}
+    removed, kept = case.find_failed_test_lines(ast.parse(PRUNE_CODE), failed)
+    lines = PRUNE_CODE.splitlines()
+    remaining = '\n'.join(line for index, line in enumerate(lines) if index not in removed)
+    tree = ast.parse(remaining)
+    assert kept == 2
+    # decorators go with their test, a class left without tests goes as a whole
+    assert '@pytest' not in remaining and 'TestAllBroken' not in remaining
+    assert [node.name for node in tree.body if isinstance(node, (ast.FunctionDef, ast.ClassDef))] == \
+        ['test_ok', 'TestGroup']
+    assert [item.name for item in tree.body[-1].body] == ['test_fine']
+
+
+def test_find_failed_test_lines_unknown_test(tmp_path):
+    case = create_testcase(tmp_path, PRUNE_CODE)
+    assert case.find_failed_test_lines(ast.parse(PRUNE_CODE), {(None, 'test_missing')}) == (None, 0)
+
+
+def test_prune_failed_tests(tmp_path, monkeypatch):
+    async def no_error(self, *args, **kwargs):
+        return False
+
+    monkeypatch.setattr(testcase.Testcase, 'find_syntax_error', no_error)
+    monkeypatch.setattr(testcase.Testcase, 'find_assert_error', no_error)
+    case = create_testcase(tmp_path, PRUNE_CODE)
+    assert asyncio.run(case.prune_failed_tests({(None, 'test_bad')})) is True
+    assert 'test_bad' not in case.get_code()
+    assert 'test_ok' in case.get_code()
+
+
+def test_prune_keeps_code_when_nothing_is_left_or_the_run_fails(tmp_path, monkeypatch):
+    async def error(self, *args, **kwargs):
+        return True
+
+    case = create_testcase(tmp_path, 'def test_bad():\n    assert False\n')
+    assert asyncio.run(case.prune_failed_tests({(None, 'test_bad')})) is None
+    assert asyncio.run(case.prune_failed_tests(set())) is None
+
+    monkeypatch.setattr(testcase.Testcase, 'find_syntax_error', error)
+    case = create_testcase(tmp_path, PRUNE_CODE)
+    assert asyncio.run(case.prune_failed_tests({(None, 'test_bad')})) is None
+    assert case.get_code() == PRUNE_CODE